@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+"""
+Shared NeuTTSAir factory for the voice chat examples
+Loading the GGUF backbone costs hundreds of MB and several seconds, so
+hand out one warm instance per (backbone, codec) pair instead of letting
+every chat class load its own copy
+"""
+
+import functools
+import sys
+from pathlib import Path
+
+sys.path.append(str(Path(__file__).parent.parent))
+
+from neuttsair.neutts import NeuTTSAir
+
+
+@functools.lru_cache(maxsize=4)
+def get_tts(backbone_repo, codec_repo, backbone_device="cpu", codec_device="cpu"):
+    """Return a shared NeuTTSAir instance for this model combination
+
+    Repeated calls with the same arguments reuse the already-loaded
+    model, so switching between chat modes in one process skips the
+    backbone load and warmup entirely.
+    """
+    return NeuTTSAir(
+        backbone_repo=backbone_repo,
+        backbone_device=backbone_device,
+        codec_repo=codec_repo,
+        codec_device=codec_device,
+    )
@@ -0,0 +1,463 @@
+#!/usr/bin/env python3
+"""
+Shared base class for the pipelined voice chat examples
+One hot path for capture, recognition, synthesis and playback, with
+swappable STT backends via mixins
+"""
+
+import json
+import time
+import threading
+import queue
+import speech_recognition as sr
+import sounddevice as sd
+import numpy as np
+import webrtcvad
+from pathlib import Path
+import sys
+import os
+
+# Add the parent directory to the path so we can import neuttsair
+sys.path.append(str(Path(__file__).parent.parent))
+
+from intent_matcher import KeywordIntentMatcher
+from neuttsair.neutts import NeuTTSAir
+
+try:
+    from numba import njit
+except ImportError:
+    njit = None
+
+
+if njit is not None:
+    @njit(cache=True, fastmath=True)
+    def _peak_normalize(x, target):
+        """Scale x in place so its peak is target - one fused pass"""
+        peak = 0.0
+        for i in range(x.shape[0]):
+            v = x[i]
+            a = -v if v < 0.0 else v
+            if a > peak:
+                peak = a
+        if peak > 0.0:
+            s = target / peak
+            for i in range(x.shape[0]):
+                x[i] *= s
+        return x
+else:
+    def _peak_normalize(x, target):
+        """Scale x in place so its peak is target (numpy fallback)"""
+        peak = np.max(np.abs(x))
+        if peak > 0:
+            np.multiply(x, target / peak, out=x)
+        return x
+
+
+class BaseVoiceChat:
+    """Pipelined voice chat: capture, STT, response generation and
+    TTS+playback each run on their own thread
+
+    Subclasses provide the intent keywords, the response text and a
+    transcribe() implementation (usually via one of the STT mixins below).
+    """
+
+    # (intent, keywords) pairs in priority order - see KeywordIntentMatcher
+    _INTENT_KEYWORDS = []
+
+    EXIT_WORDS = ('goodbye', 'quit', 'exit', 'stop', 'bye')
+
+    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf",
+                 backbone_kwargs=None):
+        """Initialize TTS, speech recognition and the pipeline stages"""
+        self.ref_audio_path = ref_audio_path
+        self.ref_text_path = ref_text_path
+        self.backbone = backbone
+
+        # Initialize TTS
+        print("Loading NeuTTS Air...")
+        self.tts = NeuTTSAir(
+            backbone_repo=backbone,
+            backbone_device="cpu",
+            codec_repo="neuphonic/neucodec",
+            codec_device="cpu",
+            backbone_kwargs=backbone_kwargs
+        )
+
+        # Load reference text
+        with open(ref_text_path, 'r') as f:
+            self.ref_text = f.read().strip()
+
+        # Pre-encode reference for faster inference
+        print("Encoding reference audio...")
+        self.ref_codes = self.tts.encode_reference(ref_audio_path)
+
+        # Initialize the recognizer and microphone exactly once, up front -
+        # sr.Microphone() opens the audio device on construction. 16 kHz is
+        # what webrtcvad and the recognizers expect
+        self.recognizer = sr.Recognizer()
+        self.microphone = sr.Microphone(sample_rate=16000)
+
+        # STT backend hook - provided by the mixins
+        self.setup_stt()
+
+        # Recognition settings for the energy-threshold fallback listener
+        self.recognizer.energy_threshold = 300
+        self.recognizer.dynamic_energy_threshold = True
+        self.recognizer.pause_threshold = 0.5
+
+        # Calibrate, then keep the stream open for the life of the chat
+        print("🎤 Calibrating microphone...")
+        self._mic_source = self.microphone.__enter__()
+        self.recognizer.adjust_for_ambient_noise(self._mic_source, duration=0.5)
+
+        # Conversation context
+        self.conversation_history = []
+
+        # Precompiled intent matcher - one pass over the input per turn
+        self.intents = KeywordIntentMatcher(self._INTENT_KEYWORDS)
+
+        # Canned responses are bit-identical across turns, so their
+        # synthesized audio is cached after the first TTS pass
+        self._wav_cache = {}
+
+        # Reusable normalization workspace (~30 s of 24 kHz audio, grown on
+        # demand) so the steady-state TTS path allocates nothing
+        self._wav_buf = np.empty(30 * 24000, dtype=np.float32)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self.out_stream = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self.out_stream.start()
+
+        # Pipeline stages - capture, recognition and synthesis each run on
+        # their own thread so the stages overlap instead of running back to back
+        self.audio_q = queue.Queue(maxsize=2)
+        self.text_q = queue.Queue(maxsize=2)
+        self.resp_q = queue.Queue(maxsize=2)
+        self.speaking = threading.Event()
+        self.running = False
+
+        # Per-stage latency accounting, summarized every few turns
+        self._stage_ms = {"stt": 0.0, "tts": 0.0}
+        self._timed_turns = 0
+
+        # Warm up the backbone in the background so the first real turn
+        # doesn't pay the cold-start cost
+        self._warm = threading.Event()
+        threading.Thread(target=self._warmup, daemon=True).start()
+
+    def _warmup(self):
+        """Run one dummy synthesis so weights and caches are resident"""
+        try:
+            self.tts.infer("Warm up.", self.ref_codes, self.ref_text)
+        except Exception as e:
+            print(f"⚠️ TTS warmup failed: {e}")
+        finally:
+            self._warm.set()
+
+    def setup_stt(self):
+        """Load the STT backend - overridden by the mixins"""
+        pass
+
+    def transcribe(self, samples):
+        """Turn captured int16 samples into text, or None - see the STT mixins"""
+        raise NotImplementedError("Subclasses must provide a transcribe() implementation")
+
+    def generate_response(self, user_input):
+        """Map the user's utterance to a reply - overridden by subclasses"""
+        raise NotImplementedError("Subclasses must provide a generate_response() implementation")
+
+    def print_banner(self):
+        """Startup banner - overridden by subclasses"""
+        pass
+
+    def capture_speech_vad(self, timeout=5, max_silence_frames=7):
+        """Capture one utterance gated by webrtcvad on 30 ms frames
+
+        Returns the recorded 16 kHz mono audio as an int16 numpy array -
+        no WAV header, no extra PCM copies; the same buffer goes to every
+        STT backend.
+        """
+        sample_rate = self.microphone.SAMPLE_RATE
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            # webrtcvad only supports these rates - fall back to the
+            # energy-threshold listener and convert its capture once
+            audio = self.recognizer.listen(self._mic_source, timeout=timeout, phrase_time_limit=10)
+            return np.frombuffer(
+                audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16
+            )
+
+        vad = webrtcvad.Vad(2)
+        frame_samples = int(sample_rate * 0.03)  # 30 ms frames
+        frames = []
+        silence_count = 0
+        started = False
+        deadline = time.time() + timeout
+
+        while True:
+            frame = self._mic_source.stream.read(frame_samples)
+            is_speech = vad.is_speech(frame, sample_rate)
+            if started:
+                frames.append(frame)
+                if is_speech:
+                    silence_count = 0
+                else:
+                    silence_count += 1
+                    if silence_count >= max_silence_frames:  # ~200 ms of silence
+                        break
+            elif is_speech:
+                started = True
+                frames.append(frame)
+            elif time.time() > deadline:
+                raise sr.WaitTimeoutError("listening timed out while waiting for speech")
+
+        return np.frombuffer(b"".join(frames), dtype=np.int16)
+
+    def _capture_loop(self):
+        """Continuously capture utterances and hand them to the recognition stage"""
+        while self.running:
+            # Don't record the AI's own voice while it's talking
+            if self.speaking.is_set():
+                time.sleep(0.05)
+                continue
+            try:
+                samples = self.capture_speech_vad(timeout=1)
+            except sr.WaitTimeoutError:
+                continue
+            if self.speaking.is_set():
+                # Playback started mid-capture - drop the recording
+                continue
+            self.audio_q.put(samples)
+
+    def _stt_loop(self):
+        """Transcribe captured audio and hand the text to the conversation loop"""
+        while self.running:
+            try:
+                samples = self.audio_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            t0 = time.perf_counter()
+            text = self.transcribe(samples)
+            self._stage_ms["stt"] += (time.perf_counter() - t0) * 1000
+            if text:
+                print(f"👤 You said: {text}")
+                self.text_q.put(text)
+
+    def _tts_loop(self):
+        """Synthesize and play queued responses"""
+        while self.running or not self.resp_q.empty():
+            try:
+                response = self.resp_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self.synthesize_response(response)
+
+    def synthesize_response(self, response_text):
+        """Convert text response to speech using NeuTTS Air"""
+        try:
+            print(f"🤖 AI: {response_text}")
+            print("🎵 Generating speech...")
+
+            # Only blocks if the user spoke before the background warmup finished
+            self._warm.wait()
+
+            # Time-varying responses (they contain digits) are never cached
+            cacheable = not any(ch.isdigit() for ch in response_text)
+            cached = self._wav_cache.get(response_text) if cacheable else None
+
+            # Stream audio straight to the speaker - no temp WAV, no afplay
+            # forks. The speaking flag keeps the capture thread from
+            # recording our own voice
+            t0 = time.perf_counter()
+            self.speaking.set()
+            try:
+                stream = self.out_stream
+                if cached is not None:
+                    # Already synthesized this exact response - just play it
+                    for start in range(0, len(cached), 2400):
+                        stream.write(cached[start:start + 2400])
+                elif getattr(self.tts, "_is_quantized_model", False):
+                    # GGUF backbone can stream chunks as they are decoded,
+                    # so playback starts after the first chunk instead of
+                    # waiting for the full waveform
+                    chunks = []
+                    for chunk in self.tts.infer_stream(response_text, self.ref_codes, self.ref_text):
+                        chunk = np.ascontiguousarray(chunk, dtype=np.float32)
+                        chunks.append(chunk)
+                        stream.write(chunk)
+                    if cacheable and chunks:
+                        self._wav_cache[response_text] = np.concatenate(chunks)
+                else:
+                    # Torch backbone has no streaming path - synthesize, then
+                    # normalize in the preallocated workspace and feed
+                    # 100 ms slices
+                    wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
+                    n = wav.shape[0]
+                    if n > self._wav_buf.size:
+                        self._wav_buf = np.empty(n, dtype=np.float32)
+                    buf = self._wav_buf[:n]
+                    np.copyto(buf, wav, casting="unsafe")
+                    wav = _peak_normalize(buf, 0.8)
+                    if cacheable:
+                        # The workspace is reused next turn, so cache a copy
+                        self._wav_cache[response_text] = wav.copy()
+                    for start in range(0, n, 2400):
+                        stream.write(wav[start:start + 2400])
+            finally:
+                self.speaking.clear()
+            self._stage_ms["tts"] += (time.perf_counter() - t0) * 1000
+
+            print("\n🎤 Listening...")
+
+        except Exception as e:
+            print(f"❌ Error generating speech: {e}")
+            self.speaking.clear()
+
+    def _print_stage_summary(self):
+        """Print average per-stage latency so tuning is evidence-based"""
+        turns = max(self._timed_turns, 1)
+        parts = ", ".join(f"{stage} {total / turns:.0f} ms"
+                          for stage, total in self._stage_ms.items())
+        print(f"⏱️ Average per turn over {turns} turns: {parts}")
+
+    def run_conversation(self):
+        """Main conversation loop - all stages run pipelined"""
+        self.print_banner()
+
+        # Start the pipeline stages
+        self.running = True
+        threads = [
+            threading.Thread(target=self._capture_loop, daemon=True),
+            threading.Thread(target=self._stt_loop, daemon=True),
+            threading.Thread(target=self._tts_loop, daemon=True),
+        ]
+        for thread in threads:
+            thread.start()
+
+        print("🎤 Listening... speak whenever you're ready!")
+
+        while True:
+            try:
+                user_input = self.text_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+
+            # Check for exit commands
+            if any(word in user_input.lower() for word in self.EXIT_WORDS):
+                self.resp_q.put(self.generate_response(user_input))
+                self.running = False
+                break
+
+            # Add to conversation history
+            self.conversation_history.append(("user", user_input))
+
+            # Generate response
+            response = self.generate_response(user_input)
+            self.conversation_history.append(("assistant", response))
+
+            # Queue response for synthesis and playback
+            self.resp_q.put(response)
+
+            self._timed_turns += 1
+            if self._timed_turns % 5 == 0:
+                self._print_stage_summary()
+
+        # Let the farewell finish playing before shutting down
+        threads[-1].join(timeout=30)
+        self.out_stream.stop()
+        self.out_stream.close()
+
+
+class GoogleSTTMixin:
+    """Recognize speech with Google's web API (requires internet)"""
+
+    def transcribe(self, samples):
+        print("🔄 Processing with Google...")
+        try:
+            # The web API wants AudioData - wrap the raw buffer, no WAV copy
+            audio = sr.AudioData(samples.tobytes(), 16000, 2)
+            return self.recognizer.recognize_google(audio)
+        except sr.UnknownValueError:
+            print("❓ Could not understand audio")
+            return None
+        except sr.RequestError as e:
+            print(f"❌ Google service error: {e}")
+            return None
+
+
+class WhisperSTTMixin(GoogleSTTMixin):
+    """faster-whisper (CTranslate2, int8) STT, 100% offline
+
+    Falls back to Google recognition when faster-whisper isn't installed.
+    """
+
+    whisper_model = "base"
+
+    def setup_stt(self):
+        print(f"Loading faster-whisper model ({self.whisper_model})...")
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            print("❌ faster-whisper is not installed - run: pip install faster-whisper")
+            print("📡 Falling back to Google Speech Recognition (requires internet)")
+            self.whisper_model_obj = None
+            return
+        self.whisper_model_obj = WhisperModel(
+            self.whisper_model, device="cpu", compute_type="int8", cpu_threads=os.cpu_count()
+        )
+        print("✅ faster-whisper loaded - 100% offline speech recognition!")
+
+    def transcribe(self, samples):
+        if self.whisper_model_obj is None:
+            return GoogleSTTMixin.transcribe(self, samples)
+
+        try:
+            print("🔄 Processing with faster-whisper (offline)...")
+
+            # Already 16 kHz int16 from capture - one conversion to float32
+            raw = samples.astype(np.float32) / 32768.0
+
+            # beam_size=1 + the built-in VAD filter keep latency down by
+            # skipping beam search and silent stretches
+            segments, info = self.whisper_model_obj.transcribe(
+                raw, beam_size=1, vad_filter=True, language="en"
+            )
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+
+            if not text:
+                print("❓ No speech detected")
+                return None
+            return text
+
+        except Exception as e:
+            print(f"❌ Whisper recognition error: {e}")
+            return None
+
+
+class VoskSTTMixin(GoogleSTTMixin):
+    """Vosk (Kaldi) STT, 100% offline
+
+    Falls back to Google recognition when vosk isn't installed.
+    """
+
+    def setup_stt(self):
+        try:
+            from vosk import Model, KaldiRecognizer
+        except ImportError:
+            self.vosk = None
+            print("📡 Vosk not installed - using Google Speech Recognition (requires internet)")
+            return
+        print("Loading Vosk model...")
+        self.vosk = KaldiRecognizer(Model(lang="en-us"), 16000)
+        print("✅ Vosk loaded - offline speech recognition!")
+
+    def transcribe(self, samples):
+        if self.vosk is None:
+            return GoogleSTTMixin.transcribe(self, samples)
+
+        print("🔄 Processing speech...")
+        self.vosk.AcceptWaveform(samples.tobytes())
+        text = json.loads(self.vosk.FinalResult()).get("text", "").strip()
+        if not text:
+            print("❓ Could not understand the audio")
+            return None
+        return text
@@ -4,18 +4,48 @@ Clean Exit Voice Chat - Properly handles stopping and cleanup
 """
 
 import argparse
+import hashlib
 import os
+import queue
 import signal
 import sys
 import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+import numpy as np
+import sounddevice as sd
 import speech_recognition as sr
+import webrtcvad
+from intent_matcher import KeywordIntentMatcher
 from neuttsair.neutts import NeuTTSAir
 
 
 class CleanExitVoiceChat:
-    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="base"):
+    # Response pools are constant, so build them once at class scope instead
+    # of re-creating the lists on every call
+    _INTENT_RESPONSES = {
+        "greet": (
+            "Hello! Great to meet you! I'm your local AI assistant.",
+            "Hi there! I'm running completely offline on your device.",
+            "Hey! Nice to chat with you. What would you like to talk about?"
+        ),
+        "help": "I'm a privacy-focused voice assistant running entirely on your device. I can have conversations, answer questions, and help with various tasks - all while keeping your data completely private!",
+        "privacy": "That's my specialty! Everything we discuss stays right here on your device. No data goes to the cloud, no companies can access our conversation. It's complete privacy!",
+        "tech": "I use OpenAI Whisper for speech recognition and NeuTTS Air for voice synthesis. Both run locally on your device, giving you powerful AI without compromising your privacy.",
+        "bye": "Goodbye! It was wonderful talking with you. Remember, everything we discussed stayed private on your device. Take care!",
+        "default": (
+            "That's interesting! Tell me more about {last_word}.",
+            "I understand. From a privacy perspective, that's really important.",
+            "Thanks for sharing that with me. What else would you like to discuss?",
+            "That's a great point. Since we're talking locally, I can be completely honest with you.",
+            "Fascinating! I'm processing this entirely on your device, so our conversation is completely private."
+        ),
+    }
+
+    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="tiny", compute_type="int8", backbone_device="cpu", engine="faster-whisper"):
         self.running = True
         
         # Setup signal handlers for clean exit
@@ -24,9 +54,10 @@ class CleanExitVoiceChat:
         
         print("🚀 Initializing Clean Exit Voice Chat...")
         
-        # Initialize TTS
+        # Initialize TTS; backbone_device="gpu" offloads all GGUF layers via
+        # llama.cpp (Metal/CUDA) and falls back to CPU if unavailable
         print("🎵 Loading NeuTTS Air...")
-        self.tts = NeuTTSAir(backbone=backbone)
+        self.tts = NeuTTSAir(backbone_repo=backbone, backbone_device=backbone_device)
         
         # Load reference audio and text
         print(f"📁 Loading reference audio: {ref_audio_path}")
@@ -34,35 +65,95 @@ class CleanExitVoiceChat:
         
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
-        
-        # Encode reference for faster inference
-        import soundfile as sf
-        ref_audio, _ = sf.read(ref_audio_path)
-        self.ref_codes = self.tts.encode(ref_audio, self.ref_text)
-        
+
         # Setup speech recognition
         print("🎤 Setting up speech recognition...")
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        
-        # Adjust for ambient noise
-        print("🔧 Calibrating microphone...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-        
-        # Setup Whisper if requested
+        # Open the mic at Whisper's 16 kHz so nothing in the pipeline ever
+        # needs to resample
+        self.microphone = sr.Microphone(sample_rate=16000, chunk_size=1024)
         self.use_whisper = True
-        if self.use_whisper:
-            print(f"🤖 Loading Whisper model: {whisper_model}")
-            import whisper
-            self.whisper_model_obj = whisper.load_model(whisper_model)
-            print("✅ Whisper loaded successfully!")
-        
+        self.engine = engine
+
+        def load_whisper():
+            if engine == "onnx":
+                # ONNX Runtime path: graph-optimized export with fused
+                # attention via optimum
+                from optimum.onnxruntime import ORTModelForSpeechSeq2Seq
+                from transformers import AutoProcessor
+                repo = f"openai/whisper-{whisper_model}"
+                model = ORTModelForSpeechSeq2Seq.from_pretrained(
+                    repo, export=True, provider="CPUExecutionProvider")
+                return model, AutoProcessor.from_pretrained(repo)
+            from faster_whisper import WhisperModel
+            return WhisperModel(whisper_model, device="cpu", compute_type=compute_type), None
+
+        def calibrate_microphone():
+            # Keep the PortAudio stream open for the whole session instead of
+            # re-opening it (100-300 ms on CoreAudio) for every listen call
+            self._mic_source = self.microphone.__enter__()
+            self.recognizer.adjust_for_ambient_noise(self._mic_source, duration=1)
+
+        # Whisper load and mic calibration don't touch the TTS model, so
+        # overlap them with the CPU-bound reference encode instead of
+        # running everything serially
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            print(f"🤖 Loading Whisper model: {whisper_model} ({compute_type})")
+            whisper_future = executor.submit(load_whisper)
+            print("🔧 Calibrating microphone...")
+            calibrate_future = executor.submit(calibrate_microphone)
+
+            # Encode reference for faster inference (cached across runs)
+            self.ref_codes = self.load_or_encode_reference(ref_audio_path)
+
+            self.whisper_model_obj, self.whisper_processor = whisper_future.result()
+            calibrate_future.result()
+        print("✅ Whisper loaded successfully!")
+
         # Conversation context
         self.conversation_history = []
-        
+        self._turn = 0
+
+        # Pipeline: queued replies are spoken by a worker thread so the main
+        # loop can go straight back to listening; _speaking mutes the mic
+        # while audio is playing to avoid echo
+        self._tts_queue = queue.Queue()
+        self._speaking = threading.Event()
+
+        # Aho-Corasick automaton: one linear pass classifies the utterance
+        # no matter how many keywords are registered
+        self._intent_matcher = KeywordIntentMatcher([
+            ("greet", ("hello", "hi", "hey", "good morning", "good afternoon", "good evening")),
+            ("help", ("what can you do", "capabilities", "help", "what are you")),
+            ("privacy", ("privacy", "data", "cloud", "offline")),
+            ("tech", ("how", "technology", "whisper", "neutts", "voice")),
+            ("bye", ("goodbye", "bye", "see you", "farewell")),
+        ])
+
+        # Warm up both models on dummy inputs so the first real turn doesn't
+        # pay first-inference setup costs
+        print("🔥 Warming up models...")
+        self.transcribe_samples(np.zeros(16000, dtype=np.float32))
+        self.tts.infer(".", self.ref_codes, self.ref_text)
+
         print("✅ Initialization complete!")
     
+    def load_or_encode_reference(self, ref_audio_path):
+        """Load cached reference codes, or encode the reference and cache it"""
+        # Key the cache on the reference audio bytes + text so a changed
+        # sample never reuses stale codes
+        with open(ref_audio_path, 'rb') as f:
+            key = hashlib.sha256(f.read() + self.ref_text.encode()).hexdigest()
+        cache_path = Path(tempfile.gettempdir()) / f"neutts_ref_{key}.npy"
+
+        if cache_path.exists():
+            print("📦 Using cached reference codes")
+            return np.load(cache_path, allow_pickle=True)
+
+        ref_codes = self.tts.encode_reference(ref_audio_path)
+        np.save(cache_path, ref_codes.cpu().numpy() if hasattr(ref_codes, "cpu") else ref_codes)
+        return ref_codes
+
     def signal_handler(self, signum, frame):
         """Handle interrupt signals for clean exit"""
         print(f"\n\n🛑 Received signal {signum}. Shutting down gracefully...")
@@ -74,37 +165,75 @@ class CleanExitVoiceChat:
         """Clean up resources"""
         print("🧹 Cleaning up resources...")
         try:
-            # Kill any running audio processes
-            os.system("pkill -f afplay 2>/dev/null || true")
-            os.system("pkill -f aplay 2>/dev/null || true")
-            
-            # Clean up temporary files
-            temp_dir = tempfile.gettempdir()
-            for file in os.listdir(temp_dir):
-                if file.startswith("temp_response_") and file.endswith(".wav"):
-                    try:
-                        os.remove(os.path.join(temp_dir, file))
-                    except:
-                        pass
-            
+            # Close the persistent microphone stream
+            try:
+                self.microphone.__exit__(None, None, None)
+            except:
+                pass
+
+            # Stop any in-flight playback on our own output stream
+            sd.stop()
+
             print("✅ Cleanup complete!")
         except Exception as e:
             print(f"⚠️ Cleanup warning: {e}")
     
+    def capture_speech_vad(self, timeout=5, max_silence_frames=15):
+        """Capture one utterance gated by webrtcvad on 30 ms frames"""
+        sample_rate = self.microphone.SAMPLE_RATE
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            # webrtcvad only supports these rates - fall back to the
+            # energy-threshold listener
+            return self.recognizer.listen(self._mic_source, timeout=timeout, phrase_time_limit=10)
+
+        vad = webrtcvad.Vad(2)
+        frame_samples = int(sample_rate * 0.03)  # 30 ms frames
+        frames = []
+        silence_count = 0
+        started = False
+        deadline = time.time() + timeout
+
+        while self.running:
+            frame = self._mic_source.stream.read(frame_samples)
+            if self._speaking.is_set():
+                # Drop frames while the assistant is talking (echo guard)
+                continue
+            is_speech = vad.is_speech(frame, sample_rate)
+            if started:
+                frames.append(frame)
+                if is_speech:
+                    silence_count = 0
+                else:
+                    silence_count += 1
+                    if silence_count >= max_silence_frames:  # ~450 ms of silence
+                        break
+            elif is_speech:
+                started = True
+                frames.append(frame)
+            elif time.time() > deadline:
+                raise sr.WaitTimeoutError("listening timed out while waiting for speech")
+
+        if not frames:
+            return None
+        return sr.AudioData(b"".join(frames), sample_rate, self.microphone.SAMPLE_WIDTH)
+
     def listen_for_speech(self, timeout=5):
         """Listen for speech with proper error handling"""
         if not self.running:
             return None
-            
+
         try:
-            with self.microphone as source:
-                print(f"\n🎤 Listening... (speak within {timeout} seconds)")
-                print("💡 Press Ctrl+C to stop at any time")
-                
-                # Listen for audio with timeout
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
-            
-            if not self.running:
+            print(f"\n🎤 Listening... (speak within {timeout} seconds)")
+            print("💡 Press Ctrl+C to stop at any time")
+
+            # Compiled C VAD endpoints the utterance faster than the
+            # pure-Python energy loop in recognizer.listen
+            if self.use_whisper:
+                audio = self.capture_speech_vad(timeout=timeout)
+            else:
+                audio = self.recognizer.listen(self._mic_source, timeout=timeout, phrase_time_limit=10)
+
+            if not self.running or audio is None:
                 return None
                 
             print("🔄 Processing speech...")
@@ -127,39 +256,37 @@ class CleanExitVoiceChat:
                 print(f"❌ Speech recognition error: {e}")
             return None
     
+    def transcribe_samples(self, samples):
+        """Transcribe a 16 kHz float32 buffer with the configured engine"""
+        if self.engine == "onnx":
+            inputs = self.whisper_processor(samples, sampling_rate=16000, return_tensors="pt")
+            generated = self.whisper_model_obj.generate(inputs.input_features)
+            return self.whisper_processor.batch_decode(generated, skip_special_tokens=True)[0].strip()
+
+        segments, _ = self.whisper_model_obj.transcribe(
+            samples, beam_size=1, vad_filter=True,
+            language="en", condition_on_previous_text=False)
+        return " ".join(segment.text for segment in segments).strip()
+
     def process_with_whisper(self, audio):
         """Process audio with Whisper"""
         try:
-            import io
-            
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                wav_data = audio.get_wav_data()
-                tmp_file.write(wav_data)
-                tmp_file_path = tmp_file.name
-            
-            try:
-                if not self.running:
-                    return None
-                    
-                # Transcribe with Whisper
-                result = self.whisper_model_obj.transcribe(tmp_file_path)
-                text = result["text"].strip()
-                
-                if text and self.running:
-                    print(f"👤 You said: {text}")
-                    return text
-                else:
-                    print("❓ No speech detected")
-                    return None
-                    
-            finally:
-                # Clean up temporary file
-                try:
-                    os.unlink(tmp_file_path)
-                except:
-                    pass
-                    
+            if not self.running:
+                return None
+
+            # Convert captured audio to a 16 kHz float32 buffer - no temp file needed
+            raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+            samples = np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+            text = self.transcribe_samples(samples)
+
+            if text and self.running:
+                print(f"👤 You said: {text}")
+                return text
+            else:
+                print("❓ No speech detected")
+                return None
+
         except Exception as e:
             print(f"❌ Whisper processing error: {e}")
             return None
@@ -183,50 +310,21 @@ class CleanExitVoiceChat:
         """Generate intelligent responses"""
         # Add user input to history
         self.conversation_history.append(("user", user_input))
-        
-        # Simple response generation with context awareness
+
+        # Classify the utterance with a single automaton pass
         user_lower = user_input.lower()
-        
-        # Check for greetings
-        if any(greeting in user_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
-            responses = [
-                f"Hello! Great to meet you! I'm your local AI assistant.",
-                f"Hi there! I'm running completely offline on your device.",
-                f"Hey! Nice to chat with you. What would you like to talk about?"
-            ]
-            response = responses[len(self.conversation_history) % len(responses)]
-        
-        # Check for questions about capabilities
-        elif any(word in user_lower for word in ['what can you do', 'capabilities', 'help', 'what are you']):
-            response = "I'm a privacy-focused voice assistant running entirely on your device. I can have conversations, answer questions, and help with various tasks - all while keeping your data completely private!"
-        
-        # Check for privacy questions
-        elif any(word in user_lower for word in ['privacy', 'data', 'cloud', 'offline']):
-            response = "That's my specialty! Everything we discuss stays right here on your device. No data goes to the cloud, no companies can access our conversation. It's complete privacy!"
-        
-        # Check for technology questions
-        elif any(word in user_lower for word in ['how', 'technology', 'whisper', 'neutts', 'voice']):
-            response = "I use OpenAI Whisper for speech recognition and NeuTTS Air for voice synthesis. Both run locally on your device, giving you powerful AI without compromising your privacy."
-        
-        # Check for goodbye
-        elif any(word in user_lower for word in ['goodbye', 'bye', 'see you', 'farewell']):
-            response = "Goodbye! It was wonderful talking with you. Remember, everything we discussed stayed private on your device. Take care!"
-        
-        # General responses with context
-        else:
-            # Provide varied, contextual responses
-            responses = [
-                f"That's interesting! Tell me more about {user_input.split()[-1] if user_input.split() else 'that'}.",
-                f"I understand. From a privacy perspective, that's really important.",
-                f"Thanks for sharing that with me. What else would you like to discuss?",
-                f"That's a great point. Since we're talking locally, I can be completely honest with you.",
-                f"Fascinating! I'm processing this entirely on your device, so our conversation is completely private."
-            ]
-            response = responses[len(self.conversation_history) % len(responses)]
-        
+        intent = self._intent_matcher.match(user_lower) or "default"
+
+        response = self._INTENT_RESPONSES[intent]
+        if isinstance(response, tuple):
+            response = response[self._turn % len(response)]
+            last_word = user_input.split()[-1] if user_input.split() else 'that'
+            response = response.format(last_word=last_word)
+        self._turn += 1
+
         # Add response to history
         self.conversation_history.append(("assistant", response))
-        
+
         return response
     
     def synthesize_response(self, response_text):
@@ -234,41 +332,44 @@ class CleanExitVoiceChat:
         if not self.running:
             return
             
+        self._speaking.set()
         try:
             print(f"🤖 AI: {response_text}")
             print("🎵 Generating speech...")
-            
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Create unique temporary file
-            import time
-            timestamp = int(time.time() * 1000)
-            output_path = os.path.abspath(f"temp_response_{timestamp}.wav")
-            
-            # Save audio
-            import soundfile as sf
-            sf.write(output_path, wav, 24000)
-            
-            if not self.running:
-                return
-            
-            # Play audio (macOS) with error handling
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            try:
-                if os.path.exists(output_path):
-                    os.remove(output_path)
-            except:
-                pass
-                
+
+            if getattr(self.tts, "_is_quantized_model", False):
+                # Stream chunks to the output device as they are synthesized,
+                # so playback starts after the first chunk instead of waiting
+                # for the full waveform
+                with sd.OutputStream(samplerate=24000, channels=1, dtype="float32") as stream:
+                    for chunk in self.tts.infer_stream(response_text, self.ref_codes, self.ref_text):
+                        if not self.running:
+                            break
+                        stream.write(np.ascontiguousarray(chunk, dtype=np.float32))
+            else:
+                # Torch backbone has no streaming path - synthesize then play
+                wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
+
+                if not self.running:
+                    return
+
+                # Play the in-memory buffer directly - no temp WAV, no afplay fork
+                sd.play(np.asarray(wav, dtype=np.float32), 24000, blocking=True)
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
-    
+        finally:
+            self._speaking.clear()
+
+    def _tts_worker(self):
+        """Drain queued responses and speak them off the main thread"""
+        while True:
+            response = self._tts_queue.get()
+            if response is None:
+                break
+            self.synthesize_response(response)
+            self._tts_queue.task_done()
+
     def run_conversation(self):
         """Main conversation loop with proper exit handling"""
         print("\n" + "="*70)
@@ -284,31 +385,38 @@ class CleanExitVoiceChat:
         print("🛑 Press Ctrl+C at any time for clean exit")
         print("="*70 + "\n")
         
+        tts_thread = threading.Thread(target=self._tts_worker, daemon=True)
+        tts_thread.start()
+
         try:
             while self.running:
                 # Listen for user input
                 user_input = self.listen_for_speech(timeout=5)
-                
+
                 if not self.running:
                     break
-                
+
                 if user_input is None:
                     continue
-                
+
                 # Check for exit commands
                 if any(word in user_input.lower() for word in ['goodbye', 'quit', 'exit', 'stop', 'bye']):
-                    self.synthesize_response("Goodbye! Thanks for using the clean exit voice chat. Everything processed locally for your privacy!")
+                    self._tts_queue.put("Goodbye! Thanks for using the clean exit voice chat. Everything processed locally for your privacy!")
                     break
-                
+
                 # Generate response
                 response = self.generate_response(user_input)
-                
-                # Synthesize and speak response
-                self.synthesize_response(response)
-                
+
+                # Queue the reply and go straight back to listening while the
+                # worker thread synthesizes and plays it
+                self._tts_queue.put(response)
+
         except KeyboardInterrupt:
             print("\n🛑 Interrupted by user")
         finally:
+            # Let pending speech finish, then stop the worker
+            self._tts_queue.put(None)
+            tts_thread.join(timeout=30)
             print("\n🧹 Cleaning up...")
             self.cleanup()
             print("👋 Goodbye!")
@@ -322,10 +430,18 @@ def main():
                        help="Reference text file for voice cloning")
     parser.add_argument("--backbone", default="neuphonic/neutts-air-q4-gguf",
                        help="Backbone model to use")
-    parser.add_argument("--whisper_model", default="base",
+    parser.add_argument("--whisper_model", default="tiny",
                        choices=["tiny", "base", "small", "medium", "large"],
                        help="Whisper model size (tiny=fastest, large=most accurate)")
-    
+    parser.add_argument("--compute_type", default="int8",
+                       choices=["int8", "int8_float16", "float16", "float32"],
+                       help="Whisper quantization (tiny + int8 runs below real-time on CPU)")
+    parser.add_argument("--backbone_device", default="cpu", choices=["cpu", "gpu"],
+                       help="Device for the TTS backbone (gpu = llama.cpp Metal/CUDA offload)")
+    parser.add_argument("--engine", default="faster-whisper",
+                       choices=["faster-whisper", "onnx"],
+                       help="ASR engine (onnx = ONNX Runtime export via optimum)")
+
     args = parser.parse_args()
     
     # Check if files exist
@@ -339,7 +455,7 @@ def main():
     
     try:
         # Initialize clean exit voice chat
-        chat = CleanExitVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model)
+        chat = CleanExitVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model, args.compute_type, args.backbone_device, args.engine)
         
         # Start conversation
         chat.run_conversation()
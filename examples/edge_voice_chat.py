@@ -6,8 +6,12 @@ No internet required after initial setup!
 """
 
 import argparse
+import hashlib
+import tempfile
 import time
 import speech_recognition as sr
+import sounddevice as sd
+import webrtcvad
 import soundfile as sf
 import numpy as np
 from pathlib import Path
@@ -19,22 +23,38 @@ import queue
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
+from intent_matcher import KeywordIntentMatcher
 from neuttsair.neutts import NeuTTSAir
 
 
 class EdgeVoiceChat:
-    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="base"):
+    # Response pool is constant, so build it once at class scope instead of
+    # re-creating the list on every call
+    _DEFAULT_RESPONSES = (
+        "That's interesting! I'm processing this completely offline on your device.",
+        "I understand. All my responses are generated locally for your privacy.",
+        "Thanks for sharing! Your data stays on your device.",
+        "That's fascinating! I'm running entirely offline.",
+        "I appreciate you telling me that. Everything is processed locally.",
+        "That's a great point. All processing happens on your device for privacy.",
+        "I'm listening and learning, all while keeping your data private and local."
+    )
+
+    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="tiny", compute_type="int8", backbone_device="cpu"):
         """Initialize the edge voice chat system"""
         self.ref_audio_path = ref_audio_path
         self.ref_text_path = ref_text_path
         self.backbone = backbone
         self.whisper_model = whisper_model
+        self.compute_type = compute_type
+        self._turn = 0
         
-        # Initialize TTS
+        # Initialize TTS; backbone_device="gpu" offloads all GGUF layers via
+        # llama.cpp (Metal/CUDA) and falls back to CPU if unavailable
         print("Loading NeuTTS Air...")
         self.tts = NeuTTSAir(
             backbone_repo=backbone,
-            backbone_device="cpu",
+            backbone_device=backbone_device,
             codec_repo="neuphonic/neucodec",
             codec_device="cpu"
         )
@@ -43,23 +63,23 @@ class EdgeVoiceChat:
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
         
-        # Pre-encode reference for faster inference
+        # Pre-encode reference for faster inference (cached across runs)
         print("Encoding reference audio...")
-        self.ref_codes = self.tts.encode_reference(ref_audio_path)
-        
+        self.ref_codes = self.load_or_encode_reference(ref_audio_path)
+
         # Initialize Whisper for edge speech recognition
-        print(f"Loading Whisper model ({whisper_model})...")
+        print(f"Loading Whisper model ({whisper_model}, {compute_type})...")
         try:
-            import whisper
-            self.whisper_model_obj = whisper.load_model(whisper_model)
+            from faster_whisper import WhisperModel
+            self.whisper_model_obj = WhisperModel(whisper_model, device="cpu", compute_type=compute_type)
             self.use_whisper = True
             print("✅ Whisper loaded successfully - 100% offline speech recognition!")
         except ImportError:
-            print("⚠️ Whisper not installed. Installing...")
-            os.system("pip install openai-whisper")
+            print("⚠️ faster-whisper not installed. Installing...")
+            os.system("pip install faster-whisper")
             try:
-                import whisper
-                self.whisper_model_obj = whisper.load_model(whisper_model)
+                from faster_whisper import WhisperModel
+                self.whisper_model_obj = WhisperModel(whisper_model, device="cpu", compute_type=compute_type)
                 self.use_whisper = True
                 print("✅ Whisper installed and loaded!")
             except Exception as e:
@@ -68,62 +88,129 @@ class EdgeVoiceChat:
                 self.use_whisper = False
                 self.setup_google_recognition()
         
-        # Initialize microphone
+        # Initialize microphone at Whisper's 16 kHz so nothing in the
+        # pipeline ever needs to resample
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = sr.Microphone(sample_rate=16000, chunk_size=1024)
         
-        # Optimize settings for edge processing
-        self.recognizer.energy_threshold = 300
-        self.recognizer.pause_threshold = 0.8
+        # Let the energy threshold track the ambient noise floor instead of
+        # hardcoding a magic value, and shorten the endpointing waits
+        self.recognizer.dynamic_energy_threshold = True
+        self.recognizer.dynamic_energy_adjustment_damping = 0.15
+        self.recognizer.non_speaking_duration = 0.4
+        self.recognizer.pause_threshold = 0.5
         
         print("🎤 Calibrating microphone...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-        
+        # Keep the PortAudio stream open for the whole session instead of
+        # re-opening it (100-300 ms on CoreAudio) for every listen call
+        self._mic_source = self.microphone.__enter__()
+        self.recognizer.adjust_for_ambient_noise(self._mic_source, duration=1)
+
+        # Aho-Corasick automaton: one linear pass classifies the utterance
+        # no matter how many keywords are registered
+        self._intent_matcher = KeywordIntentMatcher([
+            ("greet", ("hello", "hi", "hey", "good morning", "good afternoon")),
+            ("howare", ("how are you", "how do you do", "how's it going")),
+            ("name", ("what is your name", "who are you")),
+            ("offline", ("offline", "local", "edge", "privacy")),
+            ("whisper", ("whisper", "speech recognition")),
+            ("time", ("time",)),
+            ("bye", ("goodbye", "bye", "quit", "exit")),
+        ])
+
+        # Warm up both models on dummy inputs so the first real turn doesn't
+        # pay first-inference setup costs
+        print("🔥 Warming up models...")
+        if self.use_whisper:
+            segments, _ = self.whisper_model_obj.transcribe(np.zeros(16000, dtype=np.float32), beam_size=1)
+            list(segments)
+        self.tts.infer(".", self.ref_codes, self.ref_text)
+
         print("🚀 Edge Voice Chat Ready!")
         
+    def load_or_encode_reference(self, ref_audio_path):
+        """Load cached reference codes, or encode the reference and cache it"""
+        # Key the cache on the reference audio bytes + text so a changed
+        # sample never reuses stale codes
+        with open(ref_audio_path, 'rb') as f:
+            key = hashlib.sha256(f.read() + self.ref_text.encode()).hexdigest()
+        cache_path = Path(tempfile.gettempdir()) / f"neutts_ref_{key}.npy"
+
+        if cache_path.exists():
+            print("📦 Using cached reference codes")
+            return np.load(cache_path, allow_pickle=True)
+
+        ref_codes = self.tts.encode_reference(ref_audio_path)
+        np.save(cache_path, ref_codes)
+        return ref_codes
+
     def setup_google_recognition(self):
         """Setup Google Speech Recognition as fallback"""
         self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
+        self.microphone = sr.Microphone(sample_rate=16000, chunk_size=1024)
         print("📡 Using Google Speech Recognition (requires internet)")
     
+    def capture_speech_vad(self, timeout=5, max_silence_frames=15):
+        """Capture one utterance gated by webrtcvad on 30 ms frames"""
+        sample_rate = self.microphone.SAMPLE_RATE
+        if sample_rate not in (8000, 16000, 32000, 48000):
+            # webrtcvad only supports these rates - fall back to the
+            # energy-threshold listener
+            return self.recognizer.listen(self._mic_source, timeout=timeout, phrase_time_limit=10)
+
+        vad = webrtcvad.Vad(2)
+        frame_samples = int(sample_rate * 0.03)  # 30 ms frames
+        frames = []
+        silence_count = 0
+        started = False
+        deadline = time.time() + timeout
+
+        while True:
+            frame = self._mic_source.stream.read(frame_samples)
+            is_speech = vad.is_speech(frame, sample_rate)
+            if started:
+                frames.append(frame)
+                if is_speech:
+                    silence_count = 0
+                else:
+                    silence_count += 1
+                    if silence_count >= max_silence_frames:  # ~450 ms of silence
+                        break
+            elif is_speech:
+                started = True
+                frames.append(frame)
+            elif time.time() > deadline:
+                raise sr.WaitTimeoutError("listening timed out while waiting for speech")
+
+        return sr.AudioData(b"".join(frames), sample_rate, self.microphone.SAMPLE_WIDTH)
+
     def listen_for_speech_whisper(self, timeout=5):
         """Listen for speech using Whisper (100% offline)"""
         try:
-            with self.microphone as source:
-                print(f"\n🎤 Listening... (speak within {timeout} seconds)")
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
-            
+            print(f"\n🎤 Listening... (speak within {timeout} seconds)")
+            # Compiled C VAD endpoints the utterance faster than the
+            # pure-Python energy loop in recognizer.listen
+            audio = self.capture_speech_vad(timeout=timeout)
+
             print("🔄 Processing with Whisper (offline)...")
-            
-            # Convert audio to format Whisper expects
-            import io
-            import tempfile
-            
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                # Convert audio data to WAV format
-                wav_data = audio.get_wav_data()
-                tmp_file.write(wav_data)
-                tmp_file_path = tmp_file.name
-            
-            try:
-                # Transcribe with Whisper
-                result = self.whisper_model_obj.transcribe(tmp_file_path)
-                text = result["text"].strip()
-                
-                if text:
-                    print(f"👤 You said: {text}")
-                    return text
-                else:
-                    print("❓ No speech detected")
-                    return None
-                    
-            finally:
-                # Clean up temporary file
-                os.unlink(tmp_file_path)
-                
+
+            # Convert captured audio to a 16 kHz float32 buffer - no temp file needed
+            raw = audio.get_raw_data(convert_rate=16000, convert_width=2)
+            samples = np.frombuffer(raw, np.int16).astype(np.float32) / 32768.0
+
+            # Transcribe with Whisper (int8 CTranslate2 backend)
+            segments, _ = self.whisper_model_obj.transcribe(
+                samples, beam_size=1, vad_filter=True,
+                language="en", condition_on_previous_text=False)
+            text = " ".join(segment.text for segment in segments).strip()
+
+            if text:
+                print(f"👤 You said: {text}")
+                return text
+            else:
+                print("❓ No speech detected")
+                return None
+
         except Exception as e:
             print(f"❌ Whisper recognition error: {e}")
             return None
@@ -131,10 +218,9 @@ class EdgeVoiceChat:
     def listen_for_speech_google(self, timeout=5):
         """Listen for speech using Google (requires internet)"""
         try:
-            with self.microphone as source:
-                print(f"\n🎤 Listening... (speak within {timeout} seconds)")
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
-            
+            print(f"\n🎤 Listening... (speak within {timeout} seconds)")
+            audio = self.recognizer.listen(self._mic_source, timeout=timeout, phrase_time_limit=10)
+
             print("🔄 Processing with Google...")
             text = self.recognizer.recognize_google(audio)
             print(f"👤 You said: {text}")
@@ -159,42 +245,35 @@ class EdgeVoiceChat:
     
     def generate_response(self, user_input):
         """Generate intelligent responses"""
-        user_input_lower = user_input.lower()
-        
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
+        # Classify the utterance with a single automaton pass
+        intent = self._intent_matcher.match(user_input.lower())
+
+        if intent == "greet":
             return "Hello! I'm running completely offline on your device. How are you doing?"
-        
-        elif any(question in user_input_lower for question in ['how are you', 'how do you do', 'how\'s it going']):
+
+        elif intent == "howare":
             return "I'm doing great! I'm processing everything locally on your device for maximum privacy."
-        
-        elif any(question in user_input_lower for question in ['what is your name', 'who are you']):
+
+        elif intent == "name":
             return "I'm an edge AI assistant powered by Whisper for speech recognition and NeuTTS Air for voice synthesis. Everything runs locally on your device!"
-        
-        elif any(word in user_input_lower for word in ['offline', 'local', 'edge', 'privacy']):
+
+        elif intent == "offline":
             return "Yes! I'm running completely offline. Your voice data never leaves your device, ensuring complete privacy and security."
-        
-        elif any(word in user_input_lower for word in ['whisper', 'speech recognition']):
+
+        elif intent == "whisper":
             return "I'm using Whisper for speech recognition, which runs entirely on your device. No internet required after setup!"
-        
-        elif any(word in user_input_lower for word in ['time']):
+
+        elif intent == "time":
             current_time = time.strftime("%I:%M %p")
             return f"The current time is {current_time}. All processing is happening locally on your device."
-        
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'quit', 'exit']):
+
+        elif intent == "bye":
             return "Goodbye! Thanks for using the edge voice chat. Everything processed locally for your privacy!"
-        
+
         else:
-            responses = [
-                "That's interesting! I'm processing this completely offline on your device.",
-                "I understand. All my responses are generated locally for your privacy.",
-                "Thanks for sharing! Your data stays on your device.",
-                "That's fascinating! I'm running entirely offline.",
-                "I appreciate you telling me that. Everything is processed locally.",
-                "That's a great point. All processing happens on your device for privacy.",
-                "I'm listening and learning, all while keeping your data private and local."
-            ]
-            import random
-            return random.choice(responses)
+            response = self._DEFAULT_RESPONSES[self._turn % len(self._DEFAULT_RESPONSES)]
+            self._turn += 1
+            return response
     
     def synthesize_response(self, response_text):
         """Convert text response to speech using NeuTTS Air"""
@@ -202,27 +281,26 @@ class EdgeVoiceChat:
             print(f"🤖 AI: {response_text}")
             print("🎵 Generating speech (offline)...")
             
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Audio normalization
-            if np.max(np.abs(wav)) > 0:
-                wav = wav / np.max(np.abs(wav)) * 0.8
-            
-            # Save and play audio
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+            if getattr(self.tts, "_is_quantized_model", False):
+                # Stream chunks to the output device as they are synthesized,
+                # so playback starts after the first chunk instead of waiting
+                # for the full waveform
+                with sd.OutputStream(samplerate=24000, channels=1, dtype="float32") as stream:
+                    for chunk in self.tts.infer_stream(response_text, self.ref_codes, self.ref_text):
+                        stream.write(np.ascontiguousarray(chunk, dtype=np.float32))
+            else:
+                # Torch backbone has no streaming path - synthesize then play
+                wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
+
+                # Audio normalization: compute the peak once and scale in
+                # place instead of three passes over the buffer
+                peak = np.max(np.abs(wav))
+                if peak > 0:
+                    np.multiply(wav, 0.8 / peak, out=wav)
+
+                # Play the in-memory buffer directly - no temp WAV, no afplay fork
+                sd.play(wav.astype(np.float32), 24000, blocking=True)
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
     
@@ -267,10 +345,15 @@ def main():
                        help="Reference text file for voice cloning")
     parser.add_argument("--backbone", default="neuphonic/neutts-air-q4-gguf",
                        help="Backbone model to use")
-    parser.add_argument("--whisper_model", default="base",
+    parser.add_argument("--whisper_model", default="tiny",
                        choices=["tiny", "base", "small", "medium", "large"],
                        help="Whisper model size (tiny=fastest, large=most accurate)")
-    
+    parser.add_argument("--compute_type", default="int8",
+                       choices=["int8", "int8_float16", "float16", "float32"],
+                       help="Whisper quantization (tiny + int8 runs below real-time on CPU)")
+    parser.add_argument("--backbone_device", default="cpu", choices=["cpu", "gpu"],
+                       help="Device for the TTS backbone (gpu = llama.cpp Metal/CUDA offload)")
+
     args = parser.parse_args()
     
     # Check if files exist
@@ -284,7 +367,7 @@ def main():
     
     try:
         # Initialize edge voice chat
-        chat = EdgeVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model)
+        chat = EdgeVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model, args.compute_type, args.backbone_device)
         
         # Start conversation
         chat.run_conversation()
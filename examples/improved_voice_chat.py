@@ -5,9 +5,10 @@ Multiple recognition engines and better audio handling
 """
 
 import argparse
+import random
 import time
 import speech_recognition as sr
-import soundfile as sf
+import sounddevice as sd
 import numpy as np
 from pathlib import Path
 import sys
@@ -16,10 +17,45 @@ import os
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
+from response_rules import generate_reply
 from neuttsair.neutts import NeuTTSAir
 
 
 class ImprovedVoiceChat:
+    # Replies dispatched by the shared response_rules matcher
+    _RESPONSE_TABLE = {
+        "greet": "Hello! Nice to meet you. How are you doing today?",
+        "howare": "I'm doing great, thank you for asking! I'm excited to have this conversation with you.",
+        "name": "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!",
+        "time": lambda chat: f"The current time is {time.strftime('%I:%M %p')}. How can I help you with your day?",
+        "question": "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you.",
+        "thanks": "You're very welcome! I'm glad I could help.",
+        "bye": "Goodbye! It was great talking with you. Have a wonderful day!",
+        "weather": "I don't have access to real-time weather data, but I hope you're having a nice day regardless!",
+        "help": "I'm here to help! You can ask me questions, have a conversation, or just chat. What would you like to talk about?",
+        "yes": "Great! I'm glad you agree. What else would you like to talk about?",
+        "no": "That's okay! We can talk about something else. What interests you?",
+        "maybe": "That's an interesting perspective! Tell me more about what you're thinking.",
+        "good": "That's wonderful to hear! I'm glad things are going well for you.",
+        "bad": "I'm sorry to hear that. I hope things get better for you soon. Is there anything I can help with?",
+        "tired": "It sounds like you could use some rest. I hope you get a chance to relax soon.",
+        "happy": "That's fantastic! I love hearing when people are happy. What's making you feel this way?",
+        "sad": "I'm sorry you're feeling that way. Sometimes it helps to talk about what's bothering you.",
+    }
+
+    _DEFAULT_RESPONSES = (
+        "That's really interesting! Tell me more about that.",
+        "I understand what you're saying. Can you elaborate on that?",
+        "That sounds fascinating! I'd love to hear more.",
+        "Thanks for sharing that with me. What else is on your mind?",
+        "I appreciate you telling me that. How do you feel about it?",
+        "That's a great point. What made you think of that?",
+        "I'm listening and learning from our conversation. Please continue.",
+        "That's something I hadn't thought about. Can you tell me more?",
+        "I find that really interesting. What's your perspective on this?",
+        "Thanks for bringing that up. It's definitely worth discussing.",
+    )
+
     def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf"):
         """Initialize the improved voice chat system"""
         self.ref_audio_path = ref_audio_path
@@ -42,6 +78,10 @@ class ImprovedVoiceChat:
         # Pre-encode reference for faster inference
         print("Encoding reference audio...")
         self.ref_codes = self.tts.encode_reference(ref_audio_path)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self._audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self._audio_out.start()
         print("Ready for improved voice chat!")
         
         # Initialize speech recognition with better settings
@@ -128,76 +168,15 @@ class ImprovedVoiceChat:
     def generate_response(self, user_input):
         """Generate intelligent responses"""
         user_input_lower = user_input.lower()
-        
-        # More comprehensive response patterns
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
-            return "Hello! Nice to meet you. How are you doing today?"
-        
-        elif any(question in user_input_lower for question in ['how are you', 'how do you do', 'how\'s it going', 'what\'s up']):
-            return "I'm doing great, thank you for asking! I'm excited to have this conversation with you."
-        
-        elif any(question in user_input_lower for question in ['what is your name', 'who are you', 'what\'s your name']):
-            return "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!"
-        
-        elif any(question in user_input_lower for question in ['what time is it', 'what\'s the time', 'time']):
-            current_time = time.strftime("%I:%M %p")
-            return f"The current time is {current_time}. How can I help you with your day?"
-        
-        elif any(question in user_input_lower for question in ['what', 'who', 'where', 'when', 'why', 'how']):
-            return "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you."
-        
-        elif any(word in user_input_lower for word in ['thank', 'thanks', 'thank you']):
-            return "You're very welcome! I'm glad I could help."
-        
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'see you', 'farewell', 'quit', 'exit']):
-            return "Goodbye! It was great talking with you. Have a wonderful day!"
-        
-        elif any(word in user_input_lower for word in ['weather', 'sunny', 'rainy', 'cloudy', 'temperature']):
-            return "I don't have access to real-time weather data, but I hope you're having a nice day regardless!"
-        
-        elif any(word in user_input_lower for word in ['help', 'assistance', 'support']):
-            return "I'm here to help! You can ask me questions, have a conversation, or just chat. What would you like to talk about?"
-        
-        elif any(word in user_input_lower for word in ['yes', 'yeah', 'yep', 'sure', 'okay', 'ok']):
-            return "Great! I'm glad you agree. What else would you like to talk about?"
-        
-        elif any(word in user_input_lower for word in ['no', 'nope', 'nah', 'not really']):
-            return "That's okay! We can talk about something else. What interests you?"
-        
-        elif any(word in user_input_lower for word in ['maybe', 'perhaps', 'possibly']):
-            return "That's an interesting perspective! Tell me more about what you're thinking."
-        
-        elif any(word in user_input_lower for word in ['good', 'great', 'awesome', 'excellent', 'wonderful']):
-            return "That's wonderful to hear! I'm glad things are going well for you."
-        
-        elif any(word in user_input_lower for word in ['bad', 'terrible', 'awful', 'horrible']):
-            return "I'm sorry to hear that. I hope things get better for you soon. Is there anything I can help with?"
-        
-        elif any(word in user_input_lower for word in ['tired', 'exhausted', 'sleepy']):
-            return "It sounds like you could use some rest. I hope you get a chance to relax soon."
-        
-        elif any(word in user_input_lower for word in ['happy', 'excited', 'joyful', 'cheerful']):
-            return "That's fantastic! I love hearing when people are happy. What's making you feel this way?"
-        
-        elif any(word in user_input_lower for word in ['sad', 'upset', 'disappointed']):
-            return "I'm sorry you're feeling that way. Sometimes it helps to talk about what's bothering you."
-        
-        else:
-            # More varied default responses
-            responses = [
-                "That's really interesting! Tell me more about that.",
-                "I understand what you're saying. Can you elaborate on that?",
-                "That sounds fascinating! I'd love to hear more.",
-                "Thanks for sharing that with me. What else is on your mind?",
-                "I appreciate you telling me that. How do you feel about it?",
-                "That's a great point. What made you think of that?",
-                "I'm listening and learning from our conversation. Please continue.",
-                "That's something I hadn't thought about. Can you tell me more?",
-                "I find that really interesting. What's your perspective on this?",
-                "Thanks for bringing that up. It's definitely worth discussing."
-            ]
-            import random
-            return random.choice(responses)
+
+        # One pass through the shared matcher, then a dict dispatch into
+        # this class's reply table
+        reply = generate_reply(user_input_lower, self._RESPONSE_TABLE, self)
+        if reply is not None:
+            return reply
+
+        # More varied default responses
+        return random.choice(self._DEFAULT_RESPONSES)
     
     def synthesize_response(self, response_text):
         """Convert text response to speech using NeuTTS Air"""
@@ -211,21 +190,10 @@ class ImprovedVoiceChat:
             # Better audio normalization
             if np.max(np.abs(wav)) > 0:
                 wav = wav / np.max(np.abs(wav)) * 0.8
-            
-            # Save and play audio
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+
+            # Stream straight to the speaker - no temp WAV, no afplay fork
+            self._audio_out.write(np.ascontiguousarray(wav, dtype=np.float32))
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
     
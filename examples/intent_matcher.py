@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Shared keyword-intent matcher for the voice chat examples
+Classifies an utterance in a single linear pass via Aho-Corasick
+"""
+
+import re
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+
+class KeywordIntentMatcher:
+    """Maps keyword hits to intents with a precompiled automaton
+
+    Built once from (intent, keywords) pairs in priority order; matching is
+    one pass over the input regardless of how many keywords are registered.
+    Falls back to plain substring scanning when pyahocorasick isn't
+    installed.
+    """
+
+    def __init__(self, intents):
+        self._intents = intents
+        self._priority = [intent for intent, _ in intents]
+        self._automaton = None
+        if ahocorasick is not None:
+            self._automaton = ahocorasick.Automaton()
+            for intent, keywords in intents:
+                for keyword in keywords:
+                    self._automaton.add_word(keyword, intent)
+            self._automaton.make_automaton()
+        else:
+            # Fallback tables: single-word keywords resolve with one hash
+            # lookup per input token, so only multi-word phrases still
+            # need a substring scan
+            self._word_intents = {}
+            self._phrases = []
+            for intent, keywords in intents:
+                for keyword in keywords:
+                    if " " in keyword:
+                        self._phrases.append((keyword, intent))
+                    else:
+                        self._word_intents.setdefault(keyword, intent)
+
+    def match_all(self, text):
+        """Return every intent found in text, in priority order"""
+        if self._automaton is not None:
+            found = {intent for _, intent in self._automaton.iter(text)}
+        else:
+            tokens = set(re.findall(r"[a-z']+", text))
+            found = {self._word_intents[token] for token in tokens
+                     if token in self._word_intents}
+            found.update(intent for phrase, intent in self._phrases
+                         if phrase in text)
+        return [intent for intent in self._priority if intent in found]
+
+    def match(self, text):
+        """Return the highest-priority intent found in text, or None"""
+        matched = self.match_all(text)
+        return matched[0] if matched else None
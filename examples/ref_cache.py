@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Shared reference-code disk cache for the voice chat examples
+Encoding the reference audio costs seconds of codec inference and the
+result is identical on every run - key it on the audio bytes and reuse it
+"""
+
+import hashlib
+from pathlib import Path
+
+import numpy as np
+import torch
+
+_CACHE_DIR = Path.home() / ".cache" / "neutts"
+
+
+def load_ref_codes(tts, ref_audio_path):
+    """Return reference codes for ref_audio_path, cached on disk
+
+    On a hit the codes are mmap-loaded in milliseconds; on a miss the
+    codec runs once and the result is saved for the next startup. Editing
+    the reference audio naturally invalidates the cache since the key is
+    a hash of the file bytes.
+
+    With a decoder-only codec (neuphonic/neucodec-onnx-decoder) there is
+    no encoder to run on a miss, so a pre-encoded .pt next to the audio
+    is used instead - the same convention as onnx_example.py and the
+    shipped samples/dave.pt.
+    """
+    ref_audio_path = Path(ref_audio_path)
+    ref_hash = hashlib.sha1(ref_audio_path.read_bytes()).hexdigest()
+    cache_path = _CACHE_DIR / f"{ref_hash}.npy"
+    if cache_path.exists():
+        return np.load(cache_path, mmap_mode="r")
+
+    if hasattr(tts.codec, "encode_code"):
+        codes = tts.encode_reference(ref_audio_path)
+    else:
+        pt_path = ref_audio_path.with_suffix(".pt")
+        if not pt_path.exists():
+            raise RuntimeError(
+                f"Cannot encode {ref_audio_path.name}: the loaded codec is "
+                f"decoder-only and no pre-encoded {pt_path.name} exists. "
+                "Encode the reference once with codec_repo='neuphonic/neucodec' "
+                "(see examples/encode_reference.py) or provide the .pt file."
+            )
+        codes = torch.load(pt_path)
+    try:
+        _CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        out = codes.cpu().numpy() if hasattr(codes, "cpu") else codes
+        np.save(cache_path, out)
+    except OSError as e:
+        print(f"⚠️ Could not cache reference codes: {e}")
+    return codes
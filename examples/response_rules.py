@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""
+Shared response rules for the voice chat examples
+One keyword catalog and one compiled matcher replace the per-file
+cascades of any(word in text) substring scans
+"""
+
+from intent_matcher import KeywordIntentMatcher
+
+# Keyword groups in priority order - the union of the per-example catalogs
+INTENT_KEYWORDS = [
+    ("greet", ("hello", "hi", "hey", "good morning", "good afternoon", "good evening")),
+    ("howare", ("how are you", "how do you do", "how's it going", "what's up")),
+    ("name", ("what is your name", "who are you", "what's your name")),
+    ("work", ("work", "job", "career")),
+    ("family", ("family", "parents", "siblings", "children", "kids")),
+    ("hobby", ("hobby", "sport", "music", "gaming")),
+    ("food", ("food", "eat", "restaurant", "cooking")),
+    ("time", ("time", "clock")),
+    ("question", ("what", "who", "where", "when", "why", "how")),
+    ("thanks", ("thank", "thanks")),
+    ("bye", ("goodbye", "bye", "see you", "farewell", "quit", "exit")),
+    ("weather", ("weather", "sunny", "rainy", "cloudy", "temperature")),
+    ("help", ("help", "assistance", "support")),
+    ("yes", ("yes", "yeah", "yep", "sure", "okay", "ok")),
+    ("no", ("no", "nope", "nah", "not really")),
+    ("maybe", ("maybe", "perhaps", "possibly")),
+    ("good", ("good", "great", "awesome", "excellent", "wonderful")),
+    ("bad", ("bad", "terrible", "awful", "horrible")),
+    ("tired", ("tired", "exhausted", "sleepy")),
+    ("happy", ("happy", "excited", "joyful", "cheerful")),
+    ("sad", ("sad", "upset", "disappointed")),
+    ("love", ("love", "like", "enjoy", "favorite")),
+    ("hate", ("hate", "dislike", "annoying")),
+    ("friend", ("friend", "friends", "social")),
+    ("music", ("song", "band", "artist")),
+    ("movie", ("movie", "film", "cinema", "actor")),
+    ("book", ("book", "reading", "novel", "author")),
+    ("travel", ("travel", "vacation", "trip", "visit")),
+    ("fitness", ("exercise", "fitness", "gym")),
+]
+
+# Compiled once at import - every caller shares the same automaton
+MATCHER = KeywordIntentMatcher(INTENT_KEYWORDS)
+
+
+def generate_reply(user_input_lower, table, ctx=None):
+    """Dispatch an utterance to a reply through the shared matcher
+
+    table maps intent -> reply string or callable(ctx). The highest-
+    priority matched intent that the caller's table actually covers wins,
+    so tables holding a subset of the catalog don't lose a reply to an
+    intent they can't answer. Returns None when nothing in the table
+    matches, so each example keeps its own default-response style.
+    """
+    for intent in MATCHER.match_all(user_input_lower):
+        reply = table.get(intent)
+        if reply is not None:
+            if callable(reply):
+                return reply(ctx)
+            return reply
+    return None
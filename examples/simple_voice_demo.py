@@ -5,7 +5,8 @@ Simple Voice Demo - Test NeuTTS Air voice responses
 
 import argparse
 import time
-import soundfile as sf
+import sounddevice as sd
+import numpy as np
 from pathlib import Path
 import sys
 
@@ -52,6 +53,11 @@ def main():
         # Pre-encode reference for faster inference
         print("Encoding reference audio...")
         ref_codes = tts.encode_reference(args.ref_audio)
+
+        # One playback stream for the whole demo - raw samples go straight
+        # to the device, no WAV encode and no per-response player process
+        audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        audio_out.start()
         print("Ready for voice generation!")
         
         # Demo conversation
@@ -71,26 +77,17 @@ def main():
             print(f"\n{i}. Generating: {response_text}")
             print("🎵 Synthesizing speech...")
             
-            # Generate speech
+            # Generate speech and play it straight from memory
             wav = tts.infer(response_text, ref_codes, ref_text)
-            
-            # Save and play audio
-            output_path = f"demo_response_{i}.wav"
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio (macOS)
-            import subprocess
-            subprocess.run(["afplay", output_path], check=True)
-            
-            # Clean up
-            import os
-            os.remove(output_path)
-            
+            audio_out.write(np.ascontiguousarray(wav, dtype=np.float32))
+
             # Wait a moment between responses
             if i < len(responses):
                 time.sleep(1)
-        
-        print("\n✅ Demo completed! All audio files have been played.")
+
+        audio_out.stop()
+        audio_out.close()
+        print("\n✅ Demo completed! All responses have been played.")
         
     except KeyboardInterrupt:
         print("\n\n👋 Demo ended by user.")
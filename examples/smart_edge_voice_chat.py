@@ -5,127 +5,453 @@ Uses Whisper for offline speech recognition + NeuTTS Air for voice synthesis
 """
 
 import argparse
+import gc
+import re
 import time
 import speech_recognition as sr
-import soundfile as sf
+import sounddevice as sd
+import webrtcvad
 import numpy as np
+import torch
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import os
 import random
+import string
+import threading
+import queue
 
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
+from ref_cache import load_ref_codes
 from neuttsair.neutts import NeuTTSAir
 
+# Response pools hoisted to module scope - tuples built once at import
+# instead of list literals re-allocated on every turn. *_TMPL pools carry
+# {name} / {current_time} style slots formatted after the pick, so only
+# one string is built per turn.
+_RESP_GREET_NAMED_TMPL = (
+    "Hello {name}! Great to see you again. How are you doing today?",
+    "Hi there {name}! I'm doing well, thanks for asking. What's on your mind?",
+    "Hey {name}! Good to chat with you. How has your day been so far?",
+)
+
+_RESP_GREET_ANON = (
+    "Hello! Nice to meet you. I'm an AI assistant running completely offline on your device. What's your name?",
+    "Hi there! Great to meet you. I'm processing everything locally for your privacy. What should I call you?",
+    "Hey! I'm excited to chat with you. Everything we discuss stays on your device. What's your name?",
+)
+
+_RESP_HOWAREYOU = (
+    "I'm doing great! I love running completely offline on your device. How about you?",
+    "I'm fantastic! It's so cool that we can chat with complete privacy. What's going on with you?",
+    "I'm wonderful! Being able to process everything locally means your data stays safe. How are you feeling today?",
+    "I'm excellent! This edge computing setup is really impressive. What's new with you?",
+    "I'm doing really well! I appreciate that we can have this conversation without any cloud processing. How's your day going?",
+)
+
+_RESP_NAME = (
+    "I'm an AI assistant powered by Whisper for speech recognition and NeuTTS Air for voice synthesis. Everything runs locally on your device!",
+    "I'm your local AI companion! I use Whisper to understand your speech and NeuTTS Air to respond with this cloned voice, all running offline.",
+    "I'm an edge AI assistant! I'm designed to run completely on your device using Whisper and NeuTTS Air for privacy and speed.",
+    "I'm your private AI assistant! I use cutting-edge local speech recognition and voice cloning technology, all running on your laptop.",
+)
+
+_RESP_TIME_TMPL = (
+    "The current time is {current_time} on {day_name}. How's your day going?",
+    "It's {current_time} right now. What do you have planned for today?",
+    "The time is {current_time}. Is there anything special you'd like to do today?",
+    "It's currently {current_time}. How has your {day_name} been treating you?",
+)
+
+_RESP_PRIVACY = (
+    "Yes! I'm running completely offline. Your voice data never leaves your device, ensuring complete privacy and security.",
+    "Absolutely! Everything is processed locally on your device. No cloud, no internet required after setup - just pure privacy.",
+    "That's right! I'm an edge AI assistant. All speech recognition and voice synthesis happens on your laptop for maximum privacy.",
+    "Exactly! I'm designed for edge computing. Your conversations stay private and secure on your device.",
+)
+
+_RESP_TECH = (
+    "I'm using Whisper for speech recognition and NeuTTS Air for voice synthesis, both running locally on your device!",
+    "The technology is amazing! Whisper handles speech-to-text and NeuTTS Air creates this natural voice, all offline.",
+    "It's pretty cool! Whisper understands your speech and NeuTTS Air generates my responses in this cloned voice.",
+    "I'm powered by cutting-edge local AI! Whisper for listening and NeuTTS Air for speaking, all on your device.",
+)
+
+_RESP_WORK = (
+    "Work can be both challenging and rewarding. What kind of work do you do?",
+    "I find work discussions really interesting. What's your profession?",
+    "Work is such an important part of life. Tell me about your job or career.",
+    "I'd love to hear about your work! What field are you in?",
+)
+
+_RESP_FAMILY = (
+    "Family is so important! Tell me about your family if you'd like to share.",
+    "I love hearing about families! What's your family like?",
+    "Family relationships are so meaningful. I'd be happy to listen if you want to talk about yours.",
+    "Family is wonderful! Feel free to share whatever you'd like about your family.",
+)
+
+_RESP_HOBBIES = (
+    "Hobbies make life so much more interesting! What are your favorite hobbies?",
+    "I love talking about hobbies! What do you enjoy doing in your free time?",
+    "Hobbies are great for relaxation and fun. What activities do you love?",
+    "Personal interests are fascinating! What hobbies do you have?",
+)
+
+_RESP_FOOD = (
+    "Food brings people together! What kind of cuisine do you enjoy?",
+    "I love food discussions! What's your favorite type of food?",
+    "Food is such a universal topic! What do you like to eat?",
+    "Cooking and eating are such pleasures! What are your food preferences?",
+)
+
+_RESP_EMO_POS = (
+    "That's fantastic! I'm so glad you're feeling positive. What's making you happy?",
+    "Wonderful! It's great to hear you're in a good mood. Tell me more!",
+    "That's wonderful news! I love hearing when people are happy. What's the good news?",
+    "Excellent! Positive emotions are so uplifting. What's going well for you?",
+)
+
+_RESP_EMO_NEG = (
+    "I'm sorry to hear you're feeling that way. Sometimes it helps to talk about what's bothering you.",
+    "I understand that can be difficult. I'm here to listen if you want to share more.",
+    "That sounds challenging. Remember that it's okay to feel this way, and talking can help.",
+    "I'm sorry you're going through a tough time. Would you like to talk about what's on your mind?",
+)
+
+_RESP_EMO_NEUTRAL = (
+    "Emotions are such an important part of being human. How are you feeling about everything?",
+    "Feelings can be complex sometimes. I'm here to listen if you want to share.",
+    "Emotional well-being is so important. How are you doing emotionally?",
+)
+
+_RESP_QUESTION = (
+    "That's an interesting question! I'm still learning, but I'd be happy to discuss it with you.",
+    "Great question! While I'm running locally on your device, I'd love to explore that topic together.",
+    "That's a thoughtful question! I'm processing everything offline, but let's talk about it.",
+    "Interesting point! I'm designed for privacy and local processing, but I enjoy these conversations.",
+)
+
+_RESP_THANKS = (
+    "You're very welcome! I'm glad I could help. Is there anything else you'd like to discuss?",
+    "My pleasure! I love having these conversations while keeping everything private on your device.",
+    "You're welcome! It's great that we can chat with complete privacy. What else is on your mind?",
+    "Happy to help! I appreciate that we can have this conversation locally. Anything else you'd like to talk about?",
+)
+
+_RESP_BYE_NAMED_TMPL = (
+    "Goodbye {name}! It was great talking with you. Thanks for using our private edge chat system!",
+    "See you later {name}! I enjoyed our conversation. Everything stayed private on your device.",
+    "Bye {name}! Thanks for the chat. Your privacy was completely protected throughout our conversation.",
+    "Farewell {name}! It was wonderful talking with you using this local AI system.",
+)
+
+_RESP_BYE_ANON = (
+    "Goodbye! It was great talking with you. Thanks for using the edge voice chat system!",
+    "See you later! I enjoyed our conversation. Everything stayed private on your device.",
+    "Bye! Thanks for the chat. Your privacy was completely protected throughout our conversation.",
+    "Farewell! It was wonderful talking with you using this local AI system.",
+)
+
+_RESP_CONTEXT_TMPL = (
+    "That's interesting! Building on what we were discussing about {topics}, I'd love to hear more.",
+    "Great point! This relates to our earlier conversation about {topic}. Tell me more.",
+    "I see what you mean! This connects to our discussion about {topic}. What else can you share?",
+    "That's a good perspective! It reminds me of what we talked about regarding {topic}. Continue!",
+)
+
+_RESP_CONTEXT_FRESH = (
+    "That's really interesting! I'm learning a lot from our conversation. Please continue.",
+    "I find that fascinating! Our conversation is getting quite engaging. Tell me more.",
+    "That's a great point! I'm enjoying our chat. What else would you like to share?",
+    "Interesting perspective! I'm processing everything locally and learning from our discussion. Go on!",
+)
+
+_RESP_DEFAULT = (
+    "That's really interesting! I'm processing this completely offline on your device. Tell me more about that.",
+    "I understand what you're saying. All my responses are generated locally for your privacy. Can you elaborate?",
+    "Thanks for sharing that with me. Your data stays on your device. What else is on your mind?",
+    "That's fascinating! I'm running entirely offline. I'd love to hear more about your thoughts.",
+    "I appreciate you telling me that. Everything is processed locally. How do you feel about it?",
+    "That's a great point. All processing happens on your device for privacy. What made you think of that?",
+    "I'm listening and learning, all while keeping your data private and local. Please continue.",
+    "That's something I hadn't thought about. Can you tell me more? I'm processing everything offline.",
+    "I find that really interesting. What's your perspective on this? Everything stays on your device.",
+    "Thanks for bringing that up. It's definitely worth discussing, and our conversation stays private.",
+    "That's a thoughtful comment. What else would you like to share? I'm here to listen.",
+    "I appreciate your input. This is a great conversation, and it's all happening locally on your device.",
+    "That's an interesting way to look at it. Tell me more about your thoughts on this.",
+    "I'm enjoying our chat. What other topics interest you? Everything we discuss stays private.",
+    "That's worth thinking about. What are your thoughts on this? I'm processing everything offline.",
+)
+
 
 class SmartEdgeVoiceChat:
-    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="base"):
+    # Intent keyword groups, in priority order - compiled into one regex
+    # alternation so classification is a single pass over the input
+    _INTENT_GROUPS = [
+        ("greet", ("hello", "hi", "hey", "good morning", "good afternoon", "good evening")),
+        ("howareyou", ("how are you", "how do you do", "how's it going", "what's up")),
+        ("name", ("what is your name", "who are you", "what's your name")),
+        ("time", ("time", "clock", "hour")),
+        ("privacy", ("offline", "local", "edge", "privacy", "private")),
+        ("tech", ("whisper", "speech recognition", "neutts", "ai")),
+        ("emo_pos", ("happy", "excited", "joyful", "great", "wonderful")),
+        ("emo_neg", ("sad", "upset", "disappointed", "worried")),
+        ("question", ("what", "who", "where", "when", "why", "how")),
+        ("thanks", ("thank", "thanks")),
+        ("bye", ("goodbye", "bye", "see you", "farewell", "quit", "exit")),
+    ]
+
+    # Topic keyword lists for conversation memory, compiled the same way
+    _TOPICS = [
+        ('work', ('work', 'job', 'career', 'office', 'business', 'company')),
+        ('family', ('family', 'parents', 'mother', 'father', 'sister', 'brother', 'children', 'kids')),
+        ('hobbies', ('hobby', 'hobbies', 'sport', 'music', 'art', 'reading', 'gaming', 'travel')),
+        ('food', ('food', 'eat', 'restaurant', 'cooking', 'recipe', 'meal', 'hungry')),
+        ('weather', ('weather', 'rain', 'sunny', 'cloudy', 'hot', 'cold', 'temperature')),
+        ('technology', ('computer', 'phone', 'internet', 'ai', 'technology', 'software', 'app')),
+        ('emotions', ('happy', 'sad', 'angry', 'excited', 'tired', 'worried', 'nervous', 'calm')),
+        ('time', ('time', 'clock', 'hour', 'minute', 'today', 'tomorrow', 'yesterday', 'weekend')),
+        ('location', ('home', 'school', 'store', 'park', 'city', 'country')),
+    ]
+
+    def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf", whisper_model="base", warmup=True, allow_cloud=False, codec_device=None):
         """Initialize the smart edge voice chat system"""
         self.ref_audio_path = ref_audio_path
         self.ref_text_path = ref_text_path
         self.backbone = backbone
         self.whisper_model = whisper_model
         
-        # Initialize TTS
-        print("Loading NeuTTS Air...")
+        # Initialize TTS. The codec's dense conv stack decodes much faster
+        # on a GPU when one exists, so auto-detect unless overridden; the
+        # quantized GGUF backbone stays on CPU where llama.cpp is at home
+        if codec_device is None:
+            codec_device = (
+                "cuda" if torch.cuda.is_available()
+                else "mps" if torch.backends.mps.is_available()
+                else "cpu"
+            )
+        print(f"Loading NeuTTS Air (codec on {codec_device})...")
         self.tts = NeuTTSAir(
             backbone_repo=backbone,
             backbone_device="cpu",
             codec_repo="neuphonic/neucodec",
-            codec_device="cpu"
+            codec_device=codec_device
         )
         
         # Load reference text
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
         
-        # Pre-encode reference for faster inference
+        # Pre-encode reference for faster inference (disk-cached, so
+        # repeat runs with the same voice skip the codec entirely)
         print("Encoding reference audio...")
-        self.ref_codes = self.tts.encode_reference(ref_audio_path)
-        
-        # Initialize Whisper for edge speech recognition
-        print(f"Loading Whisper model ({whisper_model})...")
+        self.ref_codes = load_ref_codes(self.tts, ref_audio_path)
+
+        # One synthesis worker so the next sentence generates while the
+        # current one plays - one worker is enough because the llama.cpp
+        # backbone is single-threaded per session
+        self._tts_pool = ThreadPoolExecutor(max_workers=1)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self._audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self._audio_out.start()
+
+        # 256-sample ramps for crossfading sentence-chunk boundaries
+        self._fade_in = np.linspace(0.0, 1.0, 256, dtype=np.float32)
+        self._fade_out = (1.0 - self._fade_in)
+
+        # Initialize faster-whisper (CTranslate2, int8) for edge speech
+        # recognition - int8 GEMM on CPU is several times faster than the
+        # stock fp32 PyTorch model at similar accuracy
+        print(f"Loading faster-whisper model ({whisper_model})...")
         try:
-            import whisper
-            self.whisper_model_obj = whisper.load_model(whisper_model)
+            from faster_whisper import WhisperModel
+            self.whisper_model_obj = WhisperModel(
+                whisper_model, device="cpu", compute_type="int8", cpu_threads=os.cpu_count()
+            )
             self.use_whisper = True
-            print("✅ Whisper loaded successfully - 100% offline speech recognition!")
+            print("✅ faster-whisper loaded - 100% offline speech recognition!")
         except ImportError:
-            print("⚠️ Whisper not installed. Installing...")
-            os.system("pip install openai-whisper")
-            try:
-                import whisper
-                self.whisper_model_obj = whisper.load_model(whisper_model)
-                self.use_whisper = True
-                print("✅ Whisper installed and loaded!")
-            except Exception as e:
-                print(f"❌ Whisper installation failed: {e}")
-                print("🔄 Falling back to Google Speech Recognition...")
-                self.use_whisper = False
-                self.setup_google_recognition()
+            if not allow_cloud:
+                raise RuntimeError(
+                    "faster-whisper is not installed. Install it with: pip install faster-whisper "
+                    "(or pass --allow_cloud to fall back to Google Speech Recognition)"
+                )
+            print("⚠️ faster-whisper not installed")
+            print("🔄 Falling back to Google Speech Recognition...")
+            self.use_whisper = False
+            self.setup_google_recognition()
         
         # Initialize microphone
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         
-        # Optimize settings
+        # Optimize settings - 0.4 s endpointing instead of the 0.8 s
+        # default shaves ~400 ms of dead air off every turn on the
+        # recognizer path (the whisper path endpoints via webrtcvad)
         self.recognizer.energy_threshold = 300
-        self.recognizer.pause_threshold = 0.8
-        
+        self.recognizer.dynamic_energy_threshold = True
+        self.recognizer.pause_threshold = 0.4
+        self.recognizer.non_speaking_duration = 0.3
+        
+        # Warm up both models while the mic calibrates - the first
+        # inference pays for lazy kernel allocation, so spend it on
+        # silence and a throwaway phrase instead of the user's first turn
+        if warmup:
+            threading.Thread(target=self._warmup, daemon=True).start()
+
         print("🎤 Calibrating microphone...")
         with self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source, duration=1)
         
-        # Conversation context and memory
-        self.conversation_history = []
+        # Conversation context and memory - bounded so hour-long sessions
+        # don't grow without limit; topics keep most-recent-last ordering
+        self.conversation_history = deque(maxlen=16)
         self.user_name = None
-        self.topics_discussed = set()
+        self.topics_discussed = OrderedDict()
         self.response_count = 0
-        
+        self._named_pool_cache = {}
+
+        # LRU cache of synthesized waveforms - the response pools are a
+        # small fixed set of strings, so repeats skip the LLM+codec entirely
+        self._tts_cache = OrderedDict()
+        self._tts_cache_max = 50
+
+        # Pipeline state: responses queue to a playback worker so the main
+        # loop can go back to listening while speech is still synthesizing.
+        # The speaking gate keeps the open mic from capturing our own voice
+        self.resp_q = queue.Queue(maxsize=2)
+        self.running = False
+        self.speaking = threading.Event()
+
+        # Build the lookup tables once. Single-word keywords invert to one
+        # token -> intent/topic dict lookup per input token; only the
+        # multi-word intent phrases still need a (much smaller) regex pass
+        self._punct_strip = str.maketrans('', '', string.punctuation)
+
+        self._intent_words = {}
+        phrase_groups = []
+        for intent, words in self._INTENT_GROUPS:
+            phrases = [w for w in words if " " in w]
+            for word in words:
+                if " " not in word:
+                    self._intent_words.setdefault(word, intent)
+            if phrases:
+                phrase_groups.append((intent, phrases))
+        self._phrase_re = re.compile("|".join(
+            "(?P<%s>%s)" % (intent, "|".join(map(re.escape, phrases)))
+            for intent, phrases in phrase_groups
+        ))
+
+        self._topic_words = {}
+        for topic, words in self._TOPICS:
+            for word in words:
+                self._topic_words.setdefault(word, topic)
+
         print("🚀 Smart Edge Voice Chat Ready!")
         
+    def _warmup(self):
+        """Run throwaway inferences so the first real turn is steady-state"""
+        try:
+            if self.use_whisper:
+                segments, _ = self.whisper_model_obj.transcribe(
+                    np.zeros(16000, dtype=np.float32), beam_size=1
+                )
+                list(segments)  # transcribe is lazy - drain it
+            # Route through the synthesis pool so a real turn never runs
+            # concurrently with the warm-up job
+            self._tts_pool.submit(self.tts.infer, "Hello there.", self.ref_codes, self.ref_text).result()
+            print("🔥 Models warmed up")
+        except Exception as e:
+            print(f"⚠️ Warm-up failed: {e}")
+
     def setup_google_recognition(self):
         """Setup Google Speech Recognition as fallback"""
         self.recognizer = sr.Recognizer()
         self.microphone = sr.Microphone()
         print("📡 Using Google Speech Recognition (requires internet)")
     
+    def capture_speech_vad(self, timeout=5, max_silence_frames=10):
+        """Capture one utterance gated by webrtcvad on 30 ms frames
+
+        The stream callback just queues raw frames; this thread runs the
+        VAD and ends the utterance after ~300 ms of trailing silence -
+        far tighter endpointing than the recognizer's 0.8 s pause loop.
+        Returns 16 kHz mono int16 samples, or None on timeout.
+        """
+        # Don't record the AI's own voice while it's talking
+        while self.speaking.is_set():
+            time.sleep(0.05)
+
+        vad = webrtcvad.Vad(2)
+        frame_q = queue.Queue()
+
+        def _cb(indata, frame_count, time_info, status):
+            frame_q.put(bytes(indata))
+
+        frames = []
+        silence_count = 0
+        started = False
+        deadline = time.time() + timeout
+        with sd.RawInputStream(samplerate=16000, blocksize=480, dtype="int16",
+                               channels=1, callback=_cb):
+            while True:
+                try:
+                    frame = frame_q.get(timeout=0.5)
+                except queue.Empty:
+                    if not started and time.time() > deadline:
+                        return None
+                    continue
+                if vad.is_speech(frame, 16000):
+                    if not started:
+                        started = True
+                    frames.append(frame)
+                    silence_count = 0
+                elif started:
+                    frames.append(frame)
+                    silence_count += 1
+                    if silence_count >= max_silence_frames:
+                        break
+                elif time.time() > deadline:
+                    return None
+
+        return np.frombuffer(b"".join(frames), dtype=np.int16)
+
     def listen_for_speech_whisper(self, timeout=5):
         """Listen for speech using Whisper (100% offline)"""
         try:
-            with self.microphone as source:
-                print(f"\n🎤 Listening... (speak within {timeout} seconds)")
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=10)
-            
-            print("🔄 Processing with Whisper (offline)...")
-            
-            # Convert audio to format Whisper expects
-            import tempfile
-            
-            # Save audio to temporary file
-            with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as tmp_file:
-                wav_data = audio.get_wav_data()
-                tmp_file.write(wav_data)
-                tmp_file_path = tmp_file.name
-            
-            try:
-                # Transcribe with Whisper
-                result = self.whisper_model_obj.transcribe(tmp_file_path)
-                text = result["text"].strip()
-                
-                if text:
-                    print(f"👤 You said: {text}")
-                    return text
-                else:
-                    print("❓ No speech detected")
-                    return None
-                    
-            finally:
-                # Clean up temporary file
-                os.unlink(tmp_file_path)
-                
+            print(f"\n🎤 Listening... (speak within {timeout} seconds)")
+            samples = self.capture_speech_vad(timeout=timeout)
+            if samples is None:
+                print("⏰ Listening timeout - no speech detected")
+                return None
+
+            print("🔄 Processing with faster-whisper (offline)...")
+
+            # Whisper accepts a 16 kHz float32 array directly - no temp WAV,
+            # no ffmpeg decode fork, no disk round-trip per utterance
+            pcm = samples.astype(np.float32) / 32768.0
+
+            # Transcribe - greedy decoding plus the built-in VAD filter
+            # keep latency down by skipping beam search and silence
+            segments, info = self.whisper_model_obj.transcribe(
+                pcm, beam_size=1, vad_filter=True
+            )
+            text = " ".join(segment.text.strip() for segment in segments).strip()
+
+            if text:
+                print(f"👤 You said: {text}")
+                return text
+            else:
+                print("❓ No speech detected")
+                return None
+
         except Exception as e:
             print(f"❌ Whisper recognition error: {e}")
             return None
@@ -160,37 +486,63 @@ class SmartEdgeVoiceChat:
             return self.listen_for_speech_google(timeout)
     
     def extract_keywords(self, text):
-        """Extract important keywords from user input"""
+        """Extract important keywords from user input - O(tokens) lookups"""
         keywords = []
-        text_lower = text.lower()
-        
-        # Common topics
-        topics = {
-            'work': ['work', 'job', 'career', 'office', 'business', 'company'],
-            'family': ['family', 'parents', 'mother', 'father', 'sister', 'brother', 'children', 'kids'],
-            'hobbies': ['hobby', 'hobbies', 'sport', 'music', 'art', 'reading', 'gaming', 'travel'],
-            'food': ['food', 'eat', 'restaurant', 'cooking', 'recipe', 'meal', 'hungry'],
-            'weather': ['weather', 'rain', 'sunny', 'cloudy', 'hot', 'cold', 'temperature'],
-            'technology': ['computer', 'phone', 'internet', 'ai', 'technology', 'software', 'app'],
-            'emotions': ['happy', 'sad', 'angry', 'excited', 'tired', 'worried', 'nervous', 'calm'],
-            'time': ['time', 'clock', 'hour', 'minute', 'today', 'tomorrow', 'yesterday', 'weekend'],
-            'location': ['home', 'work', 'school', 'store', 'park', 'city', 'country', 'travel']
-        }
-        
-        for topic, words in topics.items():
-            if any(word in text_lower for word in words):
+        for token in text.lower().translate(self._punct_strip).split():
+            topic = self._topic_words.get(token)
+            if topic is not None and topic not in keywords:
                 keywords.append(topic)
-        
         return keywords
-    
+
+    def _classify_intents(self, text_lower):
+        """All intent groups hit by the input: O(1) token lookups for the
+        single words, one small regex pass for the multi-word phrases"""
+        intents = {
+            self._intent_words[token]
+            for token in text_lower.translate(self._punct_strip).split()
+            if token in self._intent_words
+        }
+        intents.update(m.lastgroup for m in self._phrase_re.finditer(text_lower))
+        return intents
+
+    def _cache_get(self, text):
+        """Return a cached waveform for text, refreshing its LRU slot"""
+        wav = self._tts_cache.get(text)
+        if wav is not None:
+            self._tts_cache.move_to_end(text)
+        return wav
+
+    def _cache_put(self, text, wav):
+        """Store a waveform, evicting the least recently used entry"""
+        self._tts_cache[text] = wav
+        self._tts_cache.move_to_end(text)
+        if len(self._tts_cache) > self._tts_cache_max:
+            self._tts_cache.popitem(last=False)
+
+    def _named_pool(self, templates):
+        """Fill a {name} template pool once per user name and reuse it"""
+        key = (self.user_name, templates)
+        pool = self._named_pool_cache.get(key)
+        if pool is None:
+            pool = tuple(t.format(name=self.user_name) for t in templates)
+            self._named_pool_cache[key] = pool
+        return pool
+
     def generate_smart_response(self, user_input):
         """Generate intelligent, contextual responses"""
         user_input_lower = user_input.lower()
         self.response_count += 1
-        
-        # Extract keywords for context
+
+        # Classify once up front - the branch chain below just checks set
+        # membership instead of re-scanning the input per branch
+        intents = self._classify_intents(user_input_lower)
+
+        # Extract keywords for context; re-mentioning a topic bumps it to
+        # the recent end of the discussed-topics ordering
         keywords = self.extract_keywords(user_input)
-        self.topics_discussed.update(keywords)
+        for topic in keywords:
+            self.topics_discussed[topic] = None
+            self.topics_discussed.move_to_end(topic)
         
         # Store in conversation history
         self.conversation_history.append(("user", user_input))
@@ -204,247 +556,168 @@ class SmartEdgeVoiceChat:
                     break
         
         # Personalized greetings
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
+        if "greet" in intents:
             if self.user_name:
-                responses = [
-                    f"Hello {self.user_name}! Great to see you again. How are you doing today?",
-                    f"Hi there {self.user_name}! I'm doing well, thanks for asking. What's on your mind?",
-                    f"Hey {self.user_name}! Good to chat with you. How has your day been so far?"
-                ]
-            else:
-                responses = [
-                    "Hello! Nice to meet you. I'm an AI assistant running completely offline on your device. What's your name?",
-                    "Hi there! Great to meet you. I'm processing everything locally for your privacy. What should I call you?",
-                    "Hey! I'm excited to chat with you. Everything we discuss stays on your device. What's your name?"
-                ]
-            return random.choice(responses)
+                return random.choice(self._named_pool(_RESP_GREET_NAMED_TMPL))
+            return random.choice(_RESP_GREET_ANON)
         
         # How are you responses
-        elif any(question in user_input_lower for question in ['how are you', 'how do you do', 'how\'s it going', 'what\'s up']):
-            responses = [
-                "I'm doing great! I love running completely offline on your device. How about you?",
-                "I'm fantastic! It's so cool that we can chat with complete privacy. What's going on with you?",
-                "I'm wonderful! Being able to process everything locally means your data stays safe. How are you feeling today?",
-                "I'm excellent! This edge computing setup is really impressive. What's new with you?",
-                "I'm doing really well! I appreciate that we can have this conversation without any cloud processing. How's your day going?"
-            ]
-            return random.choice(responses)
+        elif "howareyou" in intents:
+            return random.choice(_RESP_HOWAREYOU)
         
         # Name-related responses
-        elif any(question in user_input_lower for question in ['what is your name', 'who are you', 'what\'s your name']):
-            responses = [
-                "I'm an AI assistant powered by Whisper for speech recognition and NeuTTS Air for voice synthesis. Everything runs locally on your device!",
-                "I'm your local AI companion! I use Whisper to understand your speech and NeuTTS Air to respond with this cloned voice, all running offline.",
-                "I'm an edge AI assistant! I'm designed to run completely on your device using Whisper and NeuTTS Air for privacy and speed.",
-                "I'm your private AI assistant! I use cutting-edge local speech recognition and voice cloning technology, all running on your laptop."
-            ]
-            return random.choice(responses)
+        elif "name" in intents:
+            return random.choice(_RESP_NAME)
         
         # Time responses
-        elif any(word in user_input_lower for word in ['time', 'clock', 'hour']):
-            current_time = time.strftime("%I:%M %p")
-            day_name = time.strftime("%A")
-            responses = [
-                f"The current time is {current_time} on {day_name}. How's your day going?",
-                f"It's {current_time} right now. What do you have planned for today?",
-                f"The time is {current_time}. Is there anything special you'd like to do today?",
-                f"It's currently {current_time}. How has your {day_name} been treating you?"
-            ]
-            return random.choice(responses)
+        elif "time" in intents:
+            return random.choice(_RESP_TIME_TMPL).format(
+                current_time=time.strftime("%I:%M %p"), day_name=time.strftime("%A")
+            )
         
         # Privacy/offline responses
-        elif any(word in user_input_lower for word in ['offline', 'local', 'edge', 'privacy', 'private']):
-            responses = [
-                "Yes! I'm running completely offline. Your voice data never leaves your device, ensuring complete privacy and security.",
-                "Absolutely! Everything is processed locally on your device. No cloud, no internet required after setup - just pure privacy.",
-                "That's right! I'm an edge AI assistant. All speech recognition and voice synthesis happens on your laptop for maximum privacy.",
-                "Exactly! I'm designed for edge computing. Your conversations stay private and secure on your device."
-            ]
-            return random.choice(responses)
+        elif "privacy" in intents:
+            return random.choice(_RESP_PRIVACY)
         
         # Technology responses
-        elif 'technology' in keywords or any(word in user_input_lower for word in ['whisper', 'speech recognition', 'neutts', 'ai']):
-            responses = [
-                "I'm using Whisper for speech recognition and NeuTTS Air for voice synthesis, both running locally on your device!",
-                "The technology is amazing! Whisper handles speech-to-text and NeuTTS Air creates this natural voice, all offline.",
-                "It's pretty cool! Whisper understands your speech and NeuTTS Air generates my responses in this cloned voice.",
-                "I'm powered by cutting-edge local AI! Whisper for listening and NeuTTS Air for speaking, all on your device."
-            ]
-            return random.choice(responses)
+        elif 'technology' in keywords or "tech" in intents:
+            return random.choice(_RESP_TECH)
         
         # Work-related responses
         elif 'work' in keywords:
-            responses = [
-                "Work can be both challenging and rewarding. What kind of work do you do?",
-                "I find work discussions really interesting. What's your profession?",
-                "Work is such an important part of life. Tell me about your job or career.",
-                "I'd love to hear about your work! What field are you in?"
-            ]
-            return random.choice(responses)
+            return random.choice(_RESP_WORK)
         
         # Family responses
         elif 'family' in keywords:
-            responses = [
-                "Family is so important! Tell me about your family if you'd like to share.",
-                "I love hearing about families! What's your family like?",
-                "Family relationships are so meaningful. I'd be happy to listen if you want to talk about yours.",
-                "Family is wonderful! Feel free to share whatever you'd like about your family."
-            ]
-            return random.choice(responses)
+            return random.choice(_RESP_FAMILY)
         
         # Hobby responses
         elif 'hobbies' in keywords:
-            responses = [
-                "Hobbies make life so much more interesting! What are your favorite hobbies?",
-                "I love talking about hobbies! What do you enjoy doing in your free time?",
-                "Hobbies are great for relaxation and fun. What activities do you love?",
-                "Personal interests are fascinating! What hobbies do you have?"
-            ]
-            return random.choice(responses)
+            return random.choice(_RESP_HOBBIES)
         
         # Food responses
         elif 'food' in keywords:
-            responses = [
-                "Food brings people together! What kind of cuisine do you enjoy?",
-                "I love food discussions! What's your favorite type of food?",
-                "Food is such a universal topic! What do you like to eat?",
-                "Cooking and eating are such pleasures! What are your food preferences?"
-            ]
-            return random.choice(responses)
+            return random.choice(_RESP_FOOD)
         
         # Emotional responses
         elif 'emotions' in keywords:
-            if any(word in user_input_lower for word in ['happy', 'excited', 'joyful', 'great', 'wonderful']):
-                responses = [
-                    "That's fantastic! I'm so glad you're feeling positive. What's making you happy?",
-                    "Wonderful! It's great to hear you're in a good mood. Tell me more!",
-                    "That's wonderful news! I love hearing when people are happy. What's the good news?",
-                    "Excellent! Positive emotions are so uplifting. What's going well for you?"
-                ]
-            elif any(word in user_input_lower for word in ['sad', 'upset', 'disappointed', 'worried']):
-                responses = [
-                    "I'm sorry to hear you're feeling that way. Sometimes it helps to talk about what's bothering you.",
-                    "I understand that can be difficult. I'm here to listen if you want to share more.",
-                    "That sounds challenging. Remember that it's okay to feel this way, and talking can help.",
-                    "I'm sorry you're going through a tough time. Would you like to talk about what's on your mind?"
-                ]
-            else:
-                responses = [
-                    "Emotions are such an important part of being human. How are you feeling about everything?",
-                    "Feelings can be complex sometimes. I'm here to listen if you want to share.",
-                    "Emotional well-being is so important. How are you doing emotionally?"
-                ]
-            return random.choice(responses)
+            if "emo_pos" in intents:
+                return random.choice(_RESP_EMO_POS)
+            elif "emo_neg" in intents:
+                return random.choice(_RESP_EMO_NEG)
+            return random.choice(_RESP_EMO_NEUTRAL)
         
         # Question responses
-        elif any(question in user_input_lower for question in ['what', 'who', 'where', 'when', 'why', 'how']):
-            responses = [
-                "That's an interesting question! I'm still learning, but I'd be happy to discuss it with you.",
-                "Great question! While I'm running locally on your device, I'd love to explore that topic together.",
-                "That's a thoughtful question! I'm processing everything offline, but let's talk about it.",
-                "Interesting point! I'm designed for privacy and local processing, but I enjoy these conversations."
-            ]
-            return random.choice(responses)
+        elif "question" in intents:
+            return random.choice(_RESP_QUESTION)
         
         # Thank you responses
-        elif any(word in user_input_lower for word in ['thank', 'thanks', 'thank you']):
-            responses = [
-                "You're very welcome! I'm glad I could help. Is there anything else you'd like to discuss?",
-                "My pleasure! I love having these conversations while keeping everything private on your device.",
-                "You're welcome! It's great that we can chat with complete privacy. What else is on your mind?",
-                "Happy to help! I appreciate that we can have this conversation locally. Anything else you'd like to talk about?"
-            ]
-            return random.choice(responses)
+        elif "thanks" in intents:
+            return random.choice(_RESP_THANKS)
         
         # Goodbye responses
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'see you', 'farewell', 'quit', 'exit']):
+        elif "bye" in intents:
             if self.user_name:
-                responses = [
-                    f"Goodbye {self.user_name}! It was great talking with you. Thanks for using our private edge chat system!",
-                    f"See you later {self.user_name}! I enjoyed our conversation. Everything stayed private on your device.",
-                    f"Bye {self.user_name}! Thanks for the chat. Your privacy was completely protected throughout our conversation.",
-                    f"Farewell {self.user_name}! It was wonderful talking with you using this local AI system."
-                ]
-            else:
-                responses = [
-                    "Goodbye! It was great talking with you. Thanks for using the edge voice chat system!",
-                    "See you later! I enjoyed our conversation. Everything stayed private on your device.",
-                    "Bye! Thanks for the chat. Your privacy was completely protected throughout our conversation.",
-                    "Farewell! It was wonderful talking with you using this local AI system."
-                ]
-            return random.choice(responses)
+                return random.choice(self._named_pool(_RESP_BYE_NAMED_TMPL))
+            return random.choice(_RESP_BYE_ANON)
         
         # Contextual responses based on conversation history
         elif len(self.conversation_history) > 2:
             recent_topics = list(self.topics_discussed)[-3:]  # Last 3 topics
             if recent_topics:
-                responses = [
-                    f"That's interesting! Building on what we were discussing about {', '.join(recent_topics)}, I'd love to hear more.",
-                    f"Great point! This relates to our earlier conversation about {recent_topics[0] if recent_topics else 'things'}. Tell me more.",
-                    f"I see what you mean! This connects to our discussion about {recent_topics[0] if recent_topics else 'topics'}. What else can you share?",
-                    f"That's a good perspective! It reminds me of what we talked about regarding {recent_topics[0] if recent_topics else 'various topics'}. Continue!"
-                ]
-            else:
-                responses = [
-                    "That's really interesting! I'm learning a lot from our conversation. Please continue.",
-                    "I find that fascinating! Our conversation is getting quite engaging. Tell me more.",
-                    "That's a great point! I'm enjoying our chat. What else would you like to share?",
-                    "Interesting perspective! I'm processing everything locally and learning from our discussion. Go on!"
-                ]
-            return random.choice(responses)
-        
+                return random.choice(_RESP_CONTEXT_TMPL).format(
+                    topics=', '.join(recent_topics), topic=recent_topics[0]
+                )
+            return random.choice(_RESP_CONTEXT_FRESH)
+
         # Default responses with variety
         else:
-            # More varied default responses
-            responses = [
-                "That's really interesting! I'm processing this completely offline on your device. Tell me more about that.",
-                "I understand what you're saying. All my responses are generated locally for your privacy. Can you elaborate?",
-                "Thanks for sharing that with me. Your data stays on your device. What else is on your mind?",
-                "That's fascinating! I'm running entirely offline. I'd love to hear more about your thoughts.",
-                "I appreciate you telling me that. Everything is processed locally. How do you feel about it?",
-                "That's a great point. All processing happens on your device for privacy. What made you think of that?",
-                "I'm listening and learning, all while keeping your data private and local. Please continue.",
-                "That's something I hadn't thought about. Can you tell me more? I'm processing everything offline.",
-                "I find that really interesting. What's your perspective on this? Everything stays on your device.",
-                "Thanks for bringing that up. It's definitely worth discussing, and our conversation stays private.",
-                "That's a thoughtful comment. What else would you like to share? I'm here to listen.",
-                "I appreciate your input. This is a great conversation, and it's all happening locally on your device.",
-                "That's an interesting way to look at it. Tell me more about your thoughts on this.",
-                "I'm enjoying our chat. What other topics interest you? Everything we discuss stays private.",
-                "That's worth thinking about. What are your thoughts on this? I'm processing everything offline."
-            ]
-            return random.choice(responses)
+            return random.choice(_RESP_DEFAULT)
     
     def synthesize_response(self, response_text):
         """Convert text response to speech using NeuTTS Air"""
         try:
             print(f"🤖 AI: {response_text}")
+
+            # Canned responses repeat often - replay the cached waveform
+            cached = self._cache_get(response_text)
+            if cached is not None:
+                print("🎵 Replaying cached speech...")
+                self._audio_out.write(cached)
+                return
+
             print("🎵 Generating speech (offline)...")
-            
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Audio normalization
-            if np.max(np.abs(wav)) > 0:
-                wav = wav / np.max(np.abs(wav)) * 0.8
-            
-            # Save and play audio
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+
+            # Sentence chunks: sentence N+1 synthesizes on the worker while
+            # sentence N plays, so time-to-first-audio tracks the first
+            # sentence instead of the whole response
+            sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", response_text.strip()) if s.strip()]
+            if not sentences:
+                return
+
+            n = len(self._fade_in)
+            played = []
+            tail = None
+            ahead = self._tts_pool.submit(self.tts.infer, sentences[0], self.ref_codes, self.ref_text)
+            for i in range(len(sentences)):
+                wav = ahead.result()
+                if i + 1 < len(sentences):
+                    ahead = self._tts_pool.submit(self.tts.infer, sentences[i + 1], self.ref_codes, self.ref_text)
+
+                # Audio normalization - one peak pass, scaled in place
+                wav = np.ascontiguousarray(wav, dtype=np.float32)
+                peak = float(np.abs(wav).max())
+                if peak > 0:
+                    np.multiply(wav, 0.8 / peak, out=wav)
+
+                # Blend this chunk into the previous chunk's held-back tail:
+                # a 256-sample crossfade removes the click at sentence
+                # boundaries that hard concatenation produces
+                if tail is not None:
+                    if len(wav) >= n:
+                        wav[:n] *= self._fade_in
+                        wav[:n] += tail * self._fade_out
+                    else:
+                        self._audio_out.write(tail)
+                        played.append(tail)
+
+                # Hold the last 256 samples back as the next fade-out ramp
+                if len(wav) > n:
+                    body, tail = wav[:-n], wav[-n:].copy()
+                else:
+                    body, tail = wav, None
+
+                # Straight to the persistent stream - no temp WAV, no afplay
+                self._audio_out.write(body)
+                played.append(body)
+
+            if tail is not None:
+                self._audio_out.write(tail)
+                played.append(tail)
+
+            # Cache the finished waveform unless the text carries per-turn
+            # values (times, dates) that would go stale on replay
+            if not any(ch.isdigit() for ch in response_text):
+                self._cache_put(response_text, played[0] if len(played) == 1 else np.concatenate(played))
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
-    
+
+    def _tts_loop(self):
+        """Playback worker - drains queued responses so the main loop can
+        listen for the next utterance while this one synthesizes and plays"""
+        while self.running or not self.resp_q.empty():
+            try:
+                response = self.resp_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.speaking.set()
+            try:
+                self.synthesize_response(response)
+            finally:
+                self.speaking.clear()
+                self.resp_q.task_done()
+
     def run_conversation(self):
         """Main conversation loop with smart responses"""
         print("\n" + "="*70)
@@ -459,25 +732,39 @@ class SmartEdgeVoiceChat:
         print("🔒 Complete Privacy - Your data stays on your device")
         print("💡 Say 'goodbye' or 'quit' to end")
         print("="*70 + "\n")
-        
+
+        self.running = True
+        tts_thread = threading.Thread(target=self._tts_loop, daemon=True)
+        tts_thread.start()
+
         while True:
             # Listen for user input
             user_input = self.listen_for_speech(timeout=5)
-            
+
             if user_input is None:
                 continue
-            
+
             # Check for exit commands
             if any(word in user_input.lower() for word in ['goodbye', 'quit', 'exit', 'stop', 'bye']):
                 response = self.generate_smart_response(user_input)
-                self.synthesize_response(response)
+                self.resp_q.put(response)
+                # Nothing left to transcribe - release the whisper weights
+                # (~200 MB) while the farewell synthesizes on the worker
+                if self.use_whisper:
+                    self.whisper_model_obj = None
+                    gc.collect()
                 break
-            
-            # Generate smart response
+
+            # Generate the response and queue it - the worker speaks it
+            # while we head straight back to listening
             response = self.generate_smart_response(user_input)
-            
-            # Synthesize and speak response
-            self.synthesize_response(response)
+            self.resp_q.put(response)
+
+        # Let the worker finish the farewell, then release the device
+        self.running = False
+        tts_thread.join(timeout=30)
+        self._audio_out.stop()
+        self._audio_out.close()
 
 
 def main():
@@ -488,10 +775,17 @@ def main():
                        help="Reference text file for voice cloning")
     parser.add_argument("--backbone", default="neuphonic/neutts-air-q4-gguf",
                        help="Backbone model to use")
-    parser.add_argument("--whisper_model", default="base",
-                       choices=["tiny", "base", "small", "medium", "large"],
-                       help="Whisper model size (tiny=fastest, large=most accurate)")
-    
+    parser.add_argument("--whisper_model", default="distil-small.en",
+                       choices=["distil-small.en", "tiny", "base", "small", "medium", "large"],
+                       help="Whisper model (distil-small.en=fastest English-only, "
+                            "large=most accurate; pick a multilingual size for non-English)")
+    parser.add_argument("--no_warmup", action="store_true",
+                       help="Skip the model warm-up inferences at startup")
+    parser.add_argument("--allow_cloud", action="store_true",
+                       help="Fall back to Google Speech Recognition if faster-whisper is missing")
+    parser.add_argument("--codec_device", default=None,
+                       help="Device for the neural codec (default: auto-detect cuda/mps/cpu)")
+
     args = parser.parse_args()
     
     # Check if files exist
@@ -505,7 +799,9 @@ def main():
     
     try:
         # Initialize smart edge voice chat
-        chat = SmartEdgeVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model)
+        chat = SmartEdgeVoiceChat(args.ref_audio, args.ref_text, args.backbone, args.whisper_model,
+                                  warmup=not args.no_warmup, allow_cloud=args.allow_cloud,
+                                  codec_device=args.codec_device)
         
         # Start conversation
         chat.run_conversation()
@@ -5,9 +5,13 @@ No speech recognition needed - perfect for testing TTS quality
 """
 
 import argparse
+import random
+import re
 import time
-import soundfile as sf
+import threading
+import sounddevice as sd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import os
@@ -15,178 +19,192 @@ import os
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
-from neuttsair.neutts import NeuTTSAir
+from _tts_singleton import get_tts
+from ref_cache import load_ref_codes
+from response_rules import generate_reply
+
+
+def _edge_fade(wav, fade=48):
+    """2 ms linear fades at chunk edges kill concatenation clicks"""
+    if len(wav) >= 2 * fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        wav[:fade] *= ramp
+        wav[-fade:] *= ramp[::-1]
+    return wav
 
 
 class TextToVoiceChat:
+    # One compiled whole-word scan decides end-of-conversation
+    _EXIT_RE = re.compile(r"\b(?:goodbye|quit|exit|stop|bye)\b")
+
+    # Replies dispatched by the shared response_rules matcher
+    _RESPONSE_TABLE = {
+        "greet": "Hello! Nice to meet you. How are you doing today?",
+        "howare": "I'm doing great, thank you for asking! I'm excited to have this conversation with you.",
+        "name": "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!",
+        "time": lambda chat: f"The current time is {time.strftime('%I:%M %p')}. How can I help you with your day?",
+        "question": "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you.",
+        "thanks": "You're very welcome! I'm glad I could help.",
+        "bye": "Goodbye! It was great talking with you. Have a wonderful day!",
+        "weather": "I don't have access to real-time weather data, but I hope you're having a nice day regardless!",
+        "help": "I'm here to help! You can ask me questions, have a conversation, or just chat. What would you like to talk about?",
+        "yes": "Great! I'm glad you agree. What else would you like to talk about?",
+        "no": "That's okay! We can talk about something else. What interests you?",
+        "maybe": "That's an interesting perspective! Tell me more about what you're thinking.",
+        "good": "That's wonderful to hear! I'm glad things are going well for you.",
+        "bad": "I'm sorry to hear that. I hope things get better for you soon. Is there anything I can help with?",
+        "tired": "It sounds like you could use some rest. I hope you get a chance to relax soon.",
+        "happy": "That's fantastic! I love hearing when people are happy. What's making you feel this way?",
+        "sad": "I'm sorry you're feeling that way. Sometimes it helps to talk about what's bothering you.",
+        "love": "That's wonderful! It's great to hear about things you love. What else do you enjoy?",
+        "hate": "I understand that can be frustrating. Would you like to talk about something more positive?",
+        "work": "Work can be both challenging and rewarding. What do you do for a living?",
+        "family": "Family is so important. Tell me about your family if you'd like.",
+        "friend": "Friends are wonderful to have. What do you like to do with your friends?",
+        "music": "Music is such a universal language. What kind of music do you enjoy?",
+        "movie": "Movies are great entertainment! What's your favorite type of movie?",
+        "book": "Reading is such a wonderful hobby. What kind of books do you enjoy?",
+        "food": "Food brings people together! What's your favorite type of cuisine?",
+        "travel": "Traveling is so exciting! Where would you like to go or where have you been?",
+        "fitness": "Staying active is important for health. What kind of sports or exercise do you enjoy?",
+        "hobby": "Hobbies make life more interesting! What are your favorite hobbies?",
+    }
+
+    # Fallback replies - a tuple built once at class scope, nothing
+    # allocated per call
+    _DEFAULT_RESPONSES = (
+        "That's really interesting! Tell me more about that.",
+        "I understand what you're saying. Can you elaborate on that?",
+        "That sounds fascinating! I'd love to hear more.",
+        "Thanks for sharing that with me. What else is on your mind?",
+        "I appreciate you telling me that. How do you feel about it?",
+        "That's a great point. What made you think of that?",
+        "I'm listening and learning from our conversation. Please continue.",
+        "That's something I hadn't thought about. Can you tell me more?",
+        "I find that really interesting. What's your perspective on this?",
+        "Thanks for bringing that up. It's definitely worth discussing.",
+        "That's a thoughtful comment. What else would you like to share?",
+        "I appreciate your input. This is a great conversation!",
+        "That's an interesting way to look at it. Tell me more.",
+        "I'm enjoying our chat. What other topics interest you?",
+        "That's worth thinking about. What are your thoughts on this?",
+    )
+
     def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf"):
         """Initialize the text-to-voice chat system"""
         self.ref_audio_path = ref_audio_path
         self.ref_text_path = ref_text_path
         self.backbone = backbone
         
-        # Initialize TTS
-        print("Loading NeuTTS Air...")
-        self.tts = NeuTTSAir(
-            backbone_repo=backbone,
-            backbone_device="cpu",
-            codec_repo="neuphonic/neucodec",
-            codec_device="cpu"
-        )
+        # Initialize TTS with the ONNX decoder - the codec is a big slice
+        # of per-utterance compute and the int8 decoder halves it on CPU
+        print("Loading NeuTTS Air with ONNX decoder...")
+        self.tts = get_tts(backbone, "neuphonic/neucodec-onnx-decoder")
         
         # Load reference text
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
         
-        # Pre-encode reference for faster inference
+        # Pre-encode reference for faster inference (disk-cached, so
+        # repeat runs with the same voice skip the codec entirely)
         print("Encoding reference audio...")
-        self.ref_codes = self.tts.encode_reference(ref_audio_path)
+        self.ref_codes = load_ref_codes(self.tts, ref_audio_path)
+
+        # One synthesis worker so the next sentence generates while the
+        # current one plays - one worker is enough because the llama.cpp
+        # backbone is single-threaded per session
+        self._tts_pool = ThreadPoolExecutor(max_workers=1)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self._audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self._audio_out.start()
+
+        # Synthesized audio for the fixed reply strings, keyed by text.
+        # Time-varying replies (they contain digits) are never cached
+        self._wav_cache = {}
+        threading.Thread(target=self._seed_wav_cache, daemon=True).start()
         print("Ready for text-to-voice chat!")
         
-    def generate_response(self, user_input):
+    def generate_response(self, user_input, lowered=None):
         """Generate intelligent responses"""
-        user_input_lower = user_input.lower()
-        
-        # Comprehensive response patterns
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon', 'good evening']):
-            return "Hello! Nice to meet you. How are you doing today?"
-        
-        elif any(question in user_input_lower for question in ['how are you', 'how do you do', 'how\'s it going', 'what\'s up']):
-            return "I'm doing great, thank you for asking! I'm excited to have this conversation with you."
-        
-        elif any(question in user_input_lower for question in ['what is your name', 'who are you', 'what\'s your name']):
-            return "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!"
-        
-        elif any(question in user_input_lower for question in ['what time is it', 'what\'s the time', 'time']):
-            current_time = time.strftime("%I:%M %p")
-            return f"The current time is {current_time}. How can I help you with your day?"
-        
-        elif any(question in user_input_lower for question in ['what', 'who', 'where', 'when', 'why', 'how']):
-            return "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you."
-        
-        elif any(word in user_input_lower for word in ['thank', 'thanks', 'thank you']):
-            return "You're very welcome! I'm glad I could help."
-        
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'see you', 'farewell', 'quit', 'exit']):
-            return "Goodbye! It was great talking with you. Have a wonderful day!"
-        
-        elif any(word in user_input_lower for word in ['weather', 'sunny', 'rainy', 'cloudy', 'temperature']):
-            return "I don't have access to real-time weather data, but I hope you're having a nice day regardless!"
-        
-        elif any(word in user_input_lower for word in ['help', 'assistance', 'support']):
-            return "I'm here to help! You can ask me questions, have a conversation, or just chat. What would you like to talk about?"
-        
-        elif any(word in user_input_lower for word in ['yes', 'yeah', 'yep', 'sure', 'okay', 'ok']):
-            return "Great! I'm glad you agree. What else would you like to talk about?"
-        
-        elif any(word in user_input_lower for word in ['no', 'nope', 'nah', 'not really']):
-            return "That's okay! We can talk about something else. What interests you?"
-        
-        elif any(word in user_input_lower for word in ['maybe', 'perhaps', 'possibly']):
-            return "That's an interesting perspective! Tell me more about what you're thinking."
-        
-        elif any(word in user_input_lower for word in ['good', 'great', 'awesome', 'excellent', 'wonderful']):
-            return "That's wonderful to hear! I'm glad things are going well for you."
-        
-        elif any(word in user_input_lower for word in ['bad', 'terrible', 'awful', 'horrible']):
-            return "I'm sorry to hear that. I hope things get better for you soon. Is there anything I can help with?"
-        
-        elif any(word in user_input_lower for word in ['tired', 'exhausted', 'sleepy']):
-            return "It sounds like you could use some rest. I hope you get a chance to relax soon."
-        
-        elif any(word in user_input_lower for word in ['happy', 'excited', 'joyful', 'cheerful']):
-            return "That's fantastic! I love hearing when people are happy. What's making you feel this way?"
-        
-        elif any(word in user_input_lower for word in ['sad', 'upset', 'disappointed']):
-            return "I'm sorry you're feeling that way. Sometimes it helps to talk about what's bothering you."
-        
-        elif any(word in user_input_lower for word in ['love', 'like', 'enjoy', 'favorite']):
-            return "That's wonderful! It's great to hear about things you love. What else do you enjoy?"
-        
-        elif any(word in user_input_lower for word in ['hate', 'dislike', 'annoying']):
-            return "I understand that can be frustrating. Would you like to talk about something more positive?"
-        
-        elif any(word in user_input_lower for word in ['work', 'job', 'career']):
-            return "Work can be both challenging and rewarding. What do you do for a living?"
-        
-        elif any(word in user_input_lower for word in ['family', 'parents', 'siblings', 'children']):
-            return "Family is so important. Tell me about your family if you'd like."
-        
-        elif any(word in user_input_lower for word in ['friend', 'friends', 'social']):
-            return "Friends are wonderful to have. What do you like to do with your friends?"
-        
-        elif any(word in user_input_lower for word in ['music', 'song', 'band', 'artist']):
-            return "Music is such a universal language. What kind of music do you enjoy?"
-        
-        elif any(word in user_input_lower for word in ['movie', 'film', 'cinema', 'actor']):
-            return "Movies are great entertainment! What's your favorite type of movie?"
-        
-        elif any(word in user_input_lower for word in ['book', 'reading', 'novel', 'author']):
-            return "Reading is such a wonderful hobby. What kind of books do you enjoy?"
-        
-        elif any(word in user_input_lower for word in ['food', 'eat', 'restaurant', 'cooking']):
-            return "Food brings people together! What's your favorite type of cuisine?"
-        
-        elif any(word in user_input_lower for word in ['travel', 'vacation', 'trip', 'visit']):
-            return "Traveling is so exciting! Where would you like to go or where have you been?"
-        
-        elif any(word in user_input_lower for word in ['sport', 'exercise', 'fitness', 'gym']):
-            return "Staying active is important for health. What kind of sports or exercise do you enjoy?"
-        
-        elif any(word in user_input_lower for word in ['hobby', 'interest', 'passion']):
-            return "Hobbies make life more interesting! What are your favorite hobbies?"
-        
-        else:
-            # More varied default responses
-            responses = [
-                "That's really interesting! Tell me more about that.",
-                "I understand what you're saying. Can you elaborate on that?",
-                "That sounds fascinating! I'd love to hear more.",
-                "Thanks for sharing that with me. What else is on your mind?",
-                "I appreciate you telling me that. How do you feel about it?",
-                "That's a great point. What made you think of that?",
-                "I'm listening and learning from our conversation. Please continue.",
-                "That's something I hadn't thought about. Can you tell me more?",
-                "I find that really interesting. What's your perspective on this?",
-                "Thanks for bringing that up. It's definitely worth discussing.",
-                "That's a thoughtful comment. What else would you like to share?",
-                "I appreciate your input. This is a great conversation!",
-                "That's an interesting way to look at it. Tell me more.",
-                "I'm enjoying our chat. What other topics interest you?",
-                "That's worth thinking about. What are your thoughts on this?"
-            ]
-            import random
-            return random.choice(responses)
+        user_input_lower = lowered if lowered is not None else user_input.lower()
+
+        # One pass through the shared matcher, then a dict dispatch into
+        # this class's reply table
+        reply = generate_reply(user_input_lower, self._RESPONSE_TABLE, self)
+        if reply is not None:
+            return reply
+
+        # More varied default responses
+        return random.choice(self._DEFAULT_RESPONSES)
     
     def synthesize_response(self, response_text):
         """Convert text response to speech using NeuTTS Air"""
         try:
             print(f"🤖 AI: {response_text}")
             print("🎵 Generating speech...")
-            
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Better audio normalization
-            if np.max(np.abs(wav)) > 0:
-                wav = wav / np.max(np.abs(wav)) * 0.8
-            
-            # Save and play audio
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+
+            cacheable = not any(ch.isdigit() for ch in response_text)
+            cached = self._wav_cache.get(response_text) if cacheable else None
+            if cached is not None:
+                # Already synthesized this exact reply - just play it
+                self._play_chunk(cached)
+                return
+
+            # Sentence chunks: sentence N+1 synthesizes on the worker while
+            # sentence N plays, so time-to-first-audio tracks the first
+            # sentence instead of the whole response
+            sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", response_text.strip()) if s.strip()]
+            if not sentences:
+                return
+
+            ahead = self._tts_pool.submit(self.tts.infer, sentences[0], self.ref_codes, self.ref_text)
+            played = []
+            for i in range(len(sentences)):
+                wav = ahead.result()
+                if i + 1 < len(sentences):
+                    ahead = self._tts_pool.submit(self.tts.infer, sentences[i + 1], self.ref_codes, self.ref_text)
+
+                # Normalize in place: one abs pass for the peak, one
+                # in-place multiply - no intermediate copies
+                wav = np.ascontiguousarray(wav, dtype=np.float32)
+                peak = float(np.abs(wav).max())
+                if peak > 0:
+                    np.multiply(wav, 0.8 / peak, out=wav)
+
+                wav = _edge_fade(wav)
+                self._play_chunk(wav)
+                played.append(wav)
+
+            if cacheable and played:
+                self._wav_cache[response_text] = np.concatenate(played) if len(played) > 1 else played[0]
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
+
+    def _play_chunk(self, wav):
+        """Write one chunk straight to the persistent output stream"""
+        self._audio_out.write(np.ascontiguousarray(wav, dtype=np.float32))
+
+    def _seed_wav_cache(self):
+        """Pre-synthesize the canned replies so their first use is instant
+
+        Jobs go through the single synthesis worker, so a live turn only
+        ever waits behind at most one in-flight warm job.
+        """
+        for text in self._RESPONSE_TABLE.values():
+            if not isinstance(text, str) or text in self._wav_cache:
+                continue
+            try:
+                wav = self._tts_pool.submit(self.tts.infer, text, self.ref_codes, self.ref_text).result()
+            except Exception as e:
+                print(f"⚠️ TTS cache warm failed: {e}")
+                return
+            wav = np.ascontiguousarray(wav, dtype=np.float32)
+            peak = float(np.abs(wav).max())
+            if peak > 0:
+                np.multiply(wav, 0.8 / peak, out=wav)
+            self._wav_cache[text] = _edge_fade(wav)
     
     def run_conversation(self):
         """Main conversation loop - type messages and get voice responses"""
@@ -207,13 +225,13 @@ class TextToVoiceChat:
                 if not user_input:
                     continue
                 
-                # Check for exit commands
-                if any(word in user_input.lower() for word in ['goodbye', 'quit', 'exit', 'stop', 'bye']):
+                text_lower = user_input.lower()
+                if self._EXIT_RE.search(text_lower):
                     self.synthesize_response("Goodbye! It was great talking with you. Have a wonderful day!")
                     break
                 
                 # Generate response
-                response = self.generate_response(user_input)
+                response = self.generate_response(user_input, lowered=text_lower)
                 
                 # Synthesize and speak response
                 self.synthesize_response(response)
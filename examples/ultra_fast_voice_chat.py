@@ -5,10 +5,15 @@ Maximum speed and minimal latency
 """
 
 import argparse
+import random
+import re
 import time
+import threading
+import queue
 import speech_recognition as sr
-import soundfile as sf
+import sounddevice as sd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import os
@@ -16,132 +21,252 @@ import os
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
-from neuttsair.neutts import NeuTTSAir
+from _tts_singleton import get_tts
+from ref_cache import load_ref_codes
+from response_rules import generate_reply
+
+
+def _edge_fade(wav, fade=48):
+    """2 ms linear fades at chunk edges kill concatenation clicks"""
+    if len(wav) >= 2 * fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        wav[:fade] *= ramp
+        wav[-fade:] *= ramp[::-1]
+    return wav
 
 
 class UltraFastVoiceChat:
+    # One compiled whole-word scan decides end-of-conversation
+    _EXIT_RE = re.compile(r"\b(?:goodbye|bye|quit|exit)\b")
+
+    # Replies dispatched by the shared response_rules matcher
+    _RESPONSE_TABLE = {
+        "greet": "Hi! How are you?",
+        "howare": "I'm good! You?",
+        "thanks": "You're welcome!",
+        "bye": "Bye! See you later!",
+        "time": lambda chat: f"It's {time.strftime('%I:%M')}.",
+    }
+
+    # Fallback replies - a tuple built once at class scope, nothing
+    # allocated per call
+    _DEFAULT_RESPONSES = (
+        "Interesting!",
+        "Tell me more.",
+        "I see.",
+        "Thanks!",
+        "Go on.",
+        "Okay.",
+        "Right.",
+    )
+
     def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf"):
         """Initialize the ultra fast voice chat system"""
         self.ref_audio_path = ref_audio_path
         self.ref_text_path = ref_text_path
         self.backbone = backbone
-        
+
+        # Kick off microphone calibration first - it blocks on 300 ms of
+        # ambient capture and is independent of the model load below, so
+        # the two overlap and calibration comes for free
+        self.recognizer = sr.Recognizer()
+        self.microphone = sr.Microphone()
+
+        # Ultra-fast recognition settings
+        self.recognizer.energy_threshold = 300
+        self.recognizer.dynamic_energy_threshold = False  # Disable for speed
+        self.recognizer.pause_threshold = 0.3  # Very short pause detection
+
+        print("Quick microphone calibration...")
+        cal_thread = threading.Thread(target=self._calibrate_mic)
+        cal_thread.start()
+
         # Initialize TTS with ONNX decoder for speed
         print("Loading NeuTTS Air with ONNX decoder...")
-        self.tts = NeuTTSAir(
-            backbone_repo=backbone,
-            backbone_device="cpu",
-            codec_repo="neuphonic/neucodec-onnx-decoder",  # Use ONNX decoder
-            codec_device="cpu"
-        )
+        self.tts = get_tts(backbone, "neuphonic/neucodec-onnx-decoder")
         
         # Load reference text
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
         
-        # Pre-encode reference for faster inference
+        # Pre-encode reference for faster inference (disk-cached, so
+        # repeat runs with the same voice skip the codec entirely)
         print("Encoding reference audio...")
-        self.ref_codes = self.tts.encode_reference(ref_audio_path)
+        self.ref_codes = load_ref_codes(self.tts, ref_audio_path)
+
+        # One synthesis worker so the next sentence generates while the
+        # current one plays - one worker is enough because the llama.cpp
+        # backbone is single-threaded per session
+        self._tts_pool = ThreadPoolExecutor(max_workers=1)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self._audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self._audio_out.start()
+
+        # Synthesized audio for the fixed reply strings, keyed by text.
+        # Time-varying replies (they contain digits) are never cached
+        self._wav_cache = {}
+        threading.Thread(target=self._seed_wav_cache, daemon=True).start()
+
+        # Reusable normalization workspace (~30 s of 24 kHz audio, grown on
+        # demand) so the steady-state TTS path allocates nothing
+        self._wav_buf = np.empty(30 * 24000, dtype=np.float32)
         print("Ready for ultra fast voice chat!")
         
-        # Initialize speech recognition with optimized settings
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        
-        # Ultra-fast recognition settings
-        self.recognizer.energy_threshold = 300
-        self.recognizer.dynamic_energy_threshold = False  # Disable for speed
-        self.recognizer.pause_threshold = 0.3  # Very short pause detection
-        
-        # Quick microphone calibration
-        print("Quick microphone calibration...")
+        # Local ASR - transcription happens on-device, no HTTPS round
+        # trip per utterance like the Google recognizer needs
+        print("Loading faster-whisper (base.en, int8)...")
+        try:
+            from faster_whisper import WhisperModel
+        except ImportError:
+            raise RuntimeError(
+                "faster-whisper is required for local recognition. "
+                "Install it with: pip install faster-whisper"
+            )
+        self.asr = WhisperModel("base.en", device="cpu", compute_type="int8", cpu_threads=os.cpu_count())
+
+        # Calibration finished long ago in the common case; joining here
+        # just guarantees the mic is ready before the first listen
+        cal_thread.join()
+
+        # Pipeline queues - recognition runs on its own thread and pushes
+        # text, synthesis runs on another and drains replies, so the mic
+        # reopens the moment playback ends instead of after the whole turn
+        self._text_q = queue.Queue()
+        self.resp_q = queue.Queue(maxsize=2)
+        self.running = False
+        self.speaking = threading.Event()
+
+    def _calibrate_mic(self):
+        """Sample ambient noise - runs concurrently with the model load"""
         with self.microphone as source:
             self.recognizer.adjust_for_ambient_noise(source, duration=0.3)
-        
-    def listen_for_speech(self, timeout=2):
-        """Ultra-fast speech recognition"""
+
+    def _on_audio(self, recognizer, audio):
+        """Background-listener callback: transcribe and queue the utterance
+
+        Runs on the listener's worker thread with its own ring buffer, so
+        the mic never closes between turns. Utterances captured while the
+        reply is playing are dropped so we don't answer our own voice.
+        """
+        if self.speaking.is_set():
+            return
         try:
-            with self.microphone as source:
-                print(f"\n🎤 Listening... (speak within {timeout} seconds)")
-                # Very short timeout and phrase limit
-                audio = self.recognizer.listen(source, timeout=timeout, phrase_time_limit=6)
-            
             print("🔄 Processing...")
-            # Fast recognition
-            text = self.recognizer.recognize_google(audio)
-            print(f"👤 You: {text}")
-            return text
-            
-        except sr.WaitTimeoutError:
-            return None
-        except sr.UnknownValueError:
-            return None
-        except sr.RequestError as e:
+            # Local transcription - greedy decode with Whisper's own VAD
+            # trimming leading/trailing silence
+            pcm = np.frombuffer(audio.get_raw_data(convert_rate=16000, convert_width=2), dtype=np.int16)
+            segments, _ = self.asr.transcribe(
+                pcm.astype(np.float32) / 32768.0, beam_size=1, vad_filter=True
+            )
+            text = " ".join(s.text.strip() for s in segments).strip()
+            if text:
+                print(f"👤 You: {text}")
+                self._text_q.put(text)
+        except Exception as e:
             print(f"❌ Recognition error: {e}")
-            return None
-    
-    def generate_response(self, user_input):
+
+    def _tts_loop(self):
+        """Consumer: synthesize and play queued responses"""
+        while self.running or not self.resp_q.empty():
+            try:
+                text = self.resp_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.speaking.set()
+            try:
+                self.synthesize_response(text)
+            finally:
+                self.speaking.clear()
+                self.resp_q.task_done()
+
+    def generate_response(self, user_input, lowered=None):
         """Generate ultra-short responses for speed"""
-        user_input_lower = user_input.lower()
-        
+        user_input_lower = lowered if lowered is not None else user_input.lower()
+
+        # One pass through the shared matcher, then a dict dispatch into
+        # this class's reply table
+        reply = generate_reply(user_input_lower, self._RESPONSE_TABLE, self)
+        if reply is not None:
+            return reply
+
         # Ultra-short responses
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey']):
-            return "Hi! How are you?"
-        
-        elif any(question in user_input_lower for question in ['how are you']):
-            return "I'm good! You?"
-        
-        elif any(word in user_input_lower for word in ['thank', 'thanks']):
-            return "You're welcome!"
-        
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'quit', 'exit']):
-            return "Bye! See you later!"
-        
-        elif any(word in user_input_lower for word in ['time']):
-            current_time = time.strftime("%I:%M")
-            return f"It's {current_time}."
-        
-        else:
-            # Ultra-short responses
-            responses = [
-                "Interesting!",
-                "Tell me more.",
-                "I see.",
-                "Thanks!",
-                "Go on.",
-                "Okay.",
-                "Right."
-            ]
-            import random
-            return random.choice(responses)
+        return random.choice(self._DEFAULT_RESPONSES)
     
     def synthesize_response(self, response_text):
         """Ultra-fast speech synthesis"""
         try:
             print(f"🤖 AI: {response_text}")
             print("🎵 Speaking...")
-            
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Quick audio normalization
-            if np.max(np.abs(wav)) > 0:
-                wav = wav / np.max(np.abs(wav)) * 0.7
-            
-            # Save and play audio
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio
-            import subprocess
-            subprocess.run(["afplay", output_path], check=False)
-            
-            # Quick cleanup
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+
+            cacheable = not any(ch.isdigit() for ch in response_text)
+            cached = self._wav_cache.get(response_text) if cacheable else None
+            if cached is not None:
+                # Already synthesized this exact reply - just play it
+                self._play_chunk(cached)
+                return
+
+            # Sentence chunks: sentence N+1 synthesizes on the worker while
+            # sentence N plays, so time-to-first-audio tracks the first
+            # sentence instead of the whole response
+            sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", response_text.strip()) if s.strip()]
+            if not sentences:
+                return
+
+            ahead = self._tts_pool.submit(self.tts.infer, sentences[0], self.ref_codes, self.ref_text)
+            played = []
+            for i in range(len(sentences)):
+                wav = ahead.result()
+                if i + 1 < len(sentences):
+                    ahead = self._tts_pool.submit(self.tts.infer, sentences[i + 1], self.ref_codes, self.ref_text)
+
+                # Normalize into the preallocated workspace - blocking
+                # playback finishes with the view before the next chunk
+                # reuses it, so steady-state turns allocate nothing
+                n = len(wav)
+                if n > self._wav_buf.size:
+                    self._wav_buf = np.empty(n, dtype=np.float32)
+                buf = self._wav_buf[:n]
+                np.copyto(buf, wav, casting="unsafe")
+                peak = float(np.abs(buf).max())
+                if peak > 0:
+                    np.multiply(buf, 0.7 / peak, out=buf)
+
+                buf = _edge_fade(buf)
+                self._play_chunk(buf)
+                if cacheable:
+                    # The workspace is reused next chunk - cache a copy
+                    played.append(buf.copy())
+
+            if cacheable and played:
+                self._wav_cache[response_text] = np.concatenate(played) if len(played) > 1 else played[0]
+
         except Exception as e:
             print(f"❌ Speech error: {e}")
+
+    def _play_chunk(self, wav):
+        """Write one chunk straight to the persistent output stream"""
+        self._audio_out.write(np.ascontiguousarray(wav, dtype=np.float32))
+
+    def _seed_wav_cache(self):
+        """Pre-synthesize the canned replies so their first use is instant
+
+        Jobs go through the single synthesis worker, so a live turn only
+        ever waits behind at most one in-flight warm job.
+        """
+        for text in self._RESPONSE_TABLE.values():
+            if not isinstance(text, str) or text in self._wav_cache:
+                continue
+            try:
+                wav = self._tts_pool.submit(self.tts.infer, text, self.ref_codes, self.ref_text).result()
+            except Exception as e:
+                print(f"⚠️ TTS cache warm failed: {e}")
+                return
+            wav = np.ascontiguousarray(wav, dtype=np.float32)
+            peak = float(np.abs(wav).max())
+            if peak > 0:
+                np.multiply(wav, 0.7 / peak, out=wav)
+            self._wav_cache[text] = _edge_fade(wav)
     
     def run_conversation(self):
         """Ultra-fast conversation loop"""
@@ -151,22 +276,39 @@ class UltraFastVoiceChat:
         print("Speak quickly for instant responses!")
         print("Say 'bye' or 'quit' to exit.")
         print("="*60 + "\n")
-        
+
+        self.running = True
+        # Zero-gap capture: the library's background listener keeps the
+        # mic open on its own worker thread and fires _on_audio per phrase
+        stop_listening = self.recognizer.listen_in_background(
+            self.microphone, self._on_audio, phrase_time_limit=6
+        )
+        tts_thread = threading.Thread(target=self._tts_loop, daemon=True)
+        tts_thread.start()
+        print("🎤 Always listening...")
+
         while True:
-            # Ultra-fast listening
-            user_input = self.listen_for_speech(timeout=2)
-            
-            if user_input is None:
+            # Drain recognized utterances from the background listener
+            try:
+                user_input = self._text_q.get(timeout=0.2)
+            except queue.Empty:
                 continue
-            
-            # Check for exit
-            if any(word in user_input.lower() for word in ['goodbye', 'bye', 'quit', 'exit']):
-                self.synthesize_response("Bye! See you later!")
+
+            text_lower = user_input.lower()
+            if self._EXIT_RE.search(text_lower):
+                self.resp_q.put("Bye! See you later!")
                 break
-            
-            # Generate and speak response
-            response = self.generate_response(user_input)
-            self.synthesize_response(response)
+
+            # Generate and queue response - listening overlaps playback
+            response = self.generate_response(user_input, lowered=text_lower)
+            self.resp_q.put(response)
+
+        # Let the farewell finish before tearing down the stream
+        stop_listening(wait_for_stop=False)
+        self.running = False
+        tts_thread.join(timeout=30)
+        self._audio_out.stop()
+        self._audio_out.close()
 
 
 def main():
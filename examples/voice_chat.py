@@ -5,12 +5,15 @@ Speak to the AI and get voice responses using neutts-air TTS
 """
 
 import argparse
+import random
+import re
 import time
 import threading
 import queue
 import speech_recognition as sr
-import soundfile as sf
+import sounddevice as sd
 import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 import sys
 import os
@@ -18,46 +21,112 @@ import os
 # Add the parent directory to the path so we can import neuttsair
 sys.path.append(str(Path(__file__).parent.parent))
 
-from neuttsair.neutts import NeuTTSAir
+from _tts_singleton import get_tts
+from ref_cache import load_ref_codes
+from response_rules import generate_reply
+
+
+def _edge_fade(wav, fade=48):
+    """2 ms linear fades at chunk edges kill concatenation clicks"""
+    if len(wav) >= 2 * fade:
+        ramp = np.linspace(0.0, 1.0, fade, dtype=np.float32)
+        wav[:fade] *= ramp
+        wav[-fade:] *= ramp[::-1]
+    return wav
 
 
 class VoiceChat:
+    # One compiled whole-word scan decides end-of-conversation
+    _EXIT_RE = re.compile(r"\b(?:goodbye|quit|exit|stop)\b")
+
+    # Replies dispatched by the shared response_rules matcher
+    _RESPONSE_TABLE = {
+        "greet": "Hello! Nice to meet you. How are you doing today?",
+        "howare": "I'm doing great, thank you for asking! I'm excited to have this conversation with you.",
+        "name": "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!",
+        "time": lambda chat: f"The current time is {time.strftime('%I:%M %p')}. How can I help you with your day?",
+        "question": "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you.",
+        "thanks": "You're very welcome! I'm glad I could help.",
+        "bye": "Goodbye! It was great talking with you. Have a wonderful day!",
+        "weather": "I don't have access to real-time weather data, but I hope you're having a nice day regardless!",
+    }
+
+    # Fallback replies - a tuple built once at class scope, nothing
+    # allocated per call
+    _DEFAULT_RESPONSES = (
+        "That's really interesting! Tell me more about that.",
+        "I understand what you're saying. Can you elaborate on that?",
+        "That sounds fascinating! I'd love to hear more.",
+        "Thanks for sharing that with me. What else is on your mind?",
+        "I appreciate you telling me that. How do you feel about it?",
+        "That's a great point. What made you think of that?",
+        "I'm listening and learning from our conversation. Please continue.",
+    )
+
     def __init__(self, ref_audio_path, ref_text_path, backbone="neuphonic/neutts-air-q4-gguf"):
         """Initialize the voice chat system"""
         self.ref_audio_path = ref_audio_path
         self.ref_text_path = ref_text_path
         self.backbone = backbone
-        
-        # Initialize TTS
-        print("Loading NeuTTS Air...")
-        self.tts = NeuTTSAir(
-            backbone_repo=backbone,
-            backbone_device="cpu",
-            codec_repo="neuphonic/neucodec",
-            codec_device="cpu"
-        )
+
+        # Kick off microphone calibration first - it blocks on a second
+        # of ambient capture and is independent of the model load below,
+        # so the two overlap and calibration comes for free
+        self.recognizer = sr.Recognizer()
+        self.microphone = sr.Microphone()
+        print("Calibrating microphone...")
+        cal_thread = threading.Thread(target=self._calibrate_mic)
+        cal_thread.start()
+
+        # Initialize TTS with the ONNX decoder - the codec is a big slice
+        # of per-utterance compute and the int8 decoder halves it on CPU
+        print("Loading NeuTTS Air with ONNX decoder...")
+        self.tts = get_tts(backbone, "neuphonic/neucodec-onnx-decoder")
         
         # Load reference text
         with open(ref_text_path, 'r') as f:
             self.ref_text = f.read().strip()
         
-        # Pre-encode reference for faster inference
+        # Pre-encode reference for faster inference (disk-cached, so
+        # repeat runs with the same voice skip the codec entirely)
         print("Encoding reference audio...")
-        self.ref_codes = self.tts.encode_reference(ref_audio_path)
+        self.ref_codes = load_ref_codes(self.tts, ref_audio_path)
+
+        # One synthesis worker so the next sentence generates while the
+        # current one plays - one worker is enough because the llama.cpp
+        # backbone is single-threaded per session
+        self._tts_pool = ThreadPoolExecutor(max_workers=1)
+
+        # One long-lived playback stream - no per-turn device open/close
+        self._audio_out = sd.OutputStream(samplerate=24000, channels=1, dtype="float32", blocksize=2400)
+        self._audio_out.start()
+
+        # Synthesized audio for the fixed reply strings, keyed by text.
+        # Time-varying replies (they contain digits) are never cached
+        self._wav_cache = {}
+        threading.Thread(target=self._seed_wav_cache, daemon=True).start()
+
+        # Calibration finished long ago in the common case; joining here
+        # just guarantees the mic is ready before the first listen
+        cal_thread.join()
         print("Ready for voice chat!")
-        
-        # Initialize speech recognition
-        self.recognizer = sr.Recognizer()
-        self.microphone = sr.Microphone()
-        
-        # Adjust for ambient noise
-        print("Calibrating microphone...")
-        with self.microphone as source:
-            self.recognizer.adjust_for_ambient_noise(source, duration=1)
-        
+
         # Conversation context
         self.conversation_history = []
-        
+
+        # Pipeline queues - recognition runs on its own thread and pushes
+        # text, synthesis runs on another and drains replies, so the mic
+        # reopens the moment playback ends instead of after the whole turn
+        self._text_q = queue.Queue()
+        self.resp_q = queue.Queue(maxsize=2)
+        self.running = False
+        self.speaking = threading.Event()
+
+    def _calibrate_mic(self):
+        """Sample ambient noise - runs concurrently with the model load"""
+        with self.microphone as source:
+            self.recognizer.adjust_for_ambient_noise(source, duration=1)
+
     def listen_for_speech(self, timeout=5):
         """Listen for speech and return transcribed text"""
         try:
@@ -82,77 +151,102 @@ class VoiceChat:
             print(f"❌ Speech recognition service error: {e}")
             return None
     
-    def generate_response(self, user_input):
+    def generate_response(self, user_input, lowered=None):
         """Generate a simple response to user input"""
         # Simple response logic - you can replace this with any AI model
-        user_input_lower = user_input.lower()
-        
-        # Simple conversational responses
-        if any(greeting in user_input_lower for greeting in ['hello', 'hi', 'hey', 'good morning', 'good afternoon']):
-            return "Hello! Nice to meet you. How are you doing today?"
-        
-        elif any(question in user_input_lower for question in ['how are you', 'how do you do', 'how\'s it going']):
-            return "I'm doing great, thank you for asking! I'm excited to have this conversation with you."
-        
-        elif any(question in user_input_lower for question in ['what', 'who', 'where', 'when', 'why', 'how']):
-            return "That's an interesting question. I'm still learning, but I'd be happy to discuss it with you."
-        
-        elif any(word in user_input_lower for word in ['thank', 'thanks']):
-            return "You're very welcome! I'm glad I could help."
-        
-        elif any(word in user_input_lower for word in ['goodbye', 'bye', 'see you', 'farewell']):
-            return "Goodbye! It was great talking with you. Have a wonderful day!"
-        
-        elif any(word in user_input_lower for word in ['name', 'call']):
-            return "I'm an AI assistant powered by NeuTTS Air. You can call me whatever you'd like!"
-        
-        elif any(word in user_input_lower for word in ['weather', 'sunny', 'rainy', 'cloudy']):
-            return "I don't have access to real-time weather data, but I hope you're having a nice day regardless!"
-        
-        elif any(word in user_input_lower for word in ['time', 'clock', 'hour', 'minute']):
-            current_time = time.strftime("%I:%M %p")
-            return f"The current time is {current_time}. How can I help you with your day?"
-        
-        else:
-            # Default responses
-            responses = [
-                "That's really interesting! Tell me more about that.",
-                "I understand what you're saying. Can you elaborate on that?",
-                "That sounds fascinating! I'd love to hear more.",
-                "Thanks for sharing that with me. What else is on your mind?",
-                "I appreciate you telling me that. How do you feel about it?",
-                "That's a great point. What made you think of that?",
-                "I'm listening and learning from our conversation. Please continue."
-            ]
-            import random
-            return random.choice(responses)
+        user_input_lower = lowered if lowered is not None else user_input.lower()
+
+        # One pass through the shared matcher, then a dict dispatch into
+        # this class's reply table
+        reply = generate_reply(user_input_lower, self._RESPONSE_TABLE, self)
+        if reply is not None:
+            return reply
+
+        # Default responses
+        return random.choice(self._DEFAULT_RESPONSES)
     
     def synthesize_response(self, response_text):
         """Convert text response to speech using NeuTTS Air"""
         try:
             print(f"🤖 AI: {response_text}")
             print("🎵 Generating speech...")
-            
-            # Generate speech
-            wav = self.tts.infer(response_text, self.ref_codes, self.ref_text)
-            
-            # Save and play audio with absolute path
-            output_path = os.path.abspath("temp_response.wav")
-            sf.write(output_path, wav, 24000)
-            
-            # Play audio (macOS) with error handling
-            import subprocess
-            result = subprocess.run(["afplay", output_path], capture_output=True, text=True)
-            if result.returncode != 0:
-                print(f"Audio playback error: {result.stderr}")
-            
-            # Clean up
-            if os.path.exists(output_path):
-                os.remove(output_path)
-            
+
+            cacheable = not any(ch.isdigit() for ch in response_text)
+            cached = self._wav_cache.get(response_text) if cacheable else None
+            if cached is not None:
+                # Already synthesized this exact reply - just play it
+                self._play_chunk(cached)
+                return
+
+            # Sentence chunks: sentence N+1 synthesizes on the worker while
+            # sentence N plays, so time-to-first-audio tracks the first
+            # sentence instead of the whole response
+            sentences = [s.strip() for s in re.split(r"(?<=[.!?])\s+", response_text.strip()) if s.strip()]
+            if not sentences:
+                return
+
+            ahead = self._tts_pool.submit(self.tts.infer, sentences[0], self.ref_codes, self.ref_text)
+            played = []
+            for i in range(len(sentences)):
+                wav = ahead.result()
+                if i + 1 < len(sentences):
+                    ahead = self._tts_pool.submit(self.tts.infer, sentences[i + 1], self.ref_codes, self.ref_text)
+
+                wav = _edge_fade(np.ascontiguousarray(wav, dtype=np.float32))
+                self._play_chunk(wav)
+                played.append(wav)
+
+            if cacheable and played:
+                self._wav_cache[response_text] = np.concatenate(played) if len(played) > 1 else played[0]
+
         except Exception as e:
             print(f"❌ Error generating speech: {e}")
+
+    def _play_chunk(self, wav):
+        """Write one chunk straight to the persistent output stream"""
+        self._audio_out.write(np.ascontiguousarray(wav, dtype=np.float32))
+
+    def _seed_wav_cache(self):
+        """Pre-synthesize the canned replies so their first use is instant
+
+        Jobs go through the single synthesis worker, so a live turn only
+        ever waits behind at most one in-flight warm job.
+        """
+        for text in self._RESPONSE_TABLE.values():
+            if not isinstance(text, str) or text in self._wav_cache:
+                continue
+            try:
+                wav = self._tts_pool.submit(self.tts.infer, text, self.ref_codes, self.ref_text).result()
+            except Exception as e:
+                print(f"⚠️ TTS cache warm failed: {e}")
+                return
+            self._wav_cache[text] = _edge_fade(np.ascontiguousarray(wav, dtype=np.float32))
     
+    def _recognizer_loop(self):
+        """Producer: capture and recognize speech, pushing text to the queue"""
+        while self.running:
+            # Don't record our own voice - wait for playback to finish
+            if self.speaking.is_set():
+                time.sleep(0.05)
+                continue
+            text = self.listen_for_speech(timeout=5)
+            if text:
+                self._text_q.put(text)
+
+    def _tts_loop(self):
+        """Consumer: synthesize and play queued responses"""
+        while self.running or not self.resp_q.empty():
+            try:
+                text = self.resp_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            self.speaking.set()
+            try:
+                self.synthesize_response(text)
+            finally:
+                self.speaking.clear()
+                self.resp_q.task_done()
+
     def run_conversation(self):
         """Main conversation loop"""
         print("\n" + "="*60)
@@ -161,28 +255,40 @@ class VoiceChat:
         print("Speak naturally and I'll respond with voice!")
         print("Say 'goodbye' or 'quit' to end the conversation.")
         print("="*60 + "\n")
-        
+
+        self.running = True
+        threading.Thread(target=self._recognizer_loop, daemon=True).start()
+        tts_thread = threading.Thread(target=self._tts_loop, daemon=True)
+        tts_thread.start()
+
         while True:
-            # Listen for user input
-            user_input = self.listen_for_speech(timeout=5)
-            
-            if user_input is None:
+            # Drain recognized utterances from the producer thread
+            try:
+                user_input = self._text_q.get(timeout=0.2)
+            except queue.Empty:
                 continue
-            
-            # Check for exit commands
-            if any(word in user_input.lower() for word in ['goodbye', 'quit', 'exit', 'stop']):
-                self.synthesize_response("Goodbye! It was great talking with you. Have a wonderful day!")
+
+            text_lower = user_input.lower()
+            if self._EXIT_RE.search(text_lower):
+                self.resp_q.put("Goodbye! It was great talking with you. Have a wonderful day!")
                 break
-            
+
             # Add to conversation history
             self.conversation_history.append(("user", user_input))
-            
+
             # Generate response
-            response = self.generate_response(user_input)
+            response = self.generate_response(user_input, lowered=text_lower)
             self.conversation_history.append(("assistant", response))
-            
-            # Synthesize and speak response
-            self.synthesize_response(response)
+
+            # Queue for the playback worker - listening resumes as soon
+            # as the reply finishes, not after the whole turn
+            self.resp_q.put(response)
+
+        # Let the farewell finish before tearing down the stream
+        self.running = False
+        tts_thread.join(timeout=30)
+        self._audio_out.stop()
+        self._audio_out.close()
 
 
 def main():
@@ -51,6 +51,7 @@ class NeuTTSAir:
         backbone_device="cpu",
         codec_repo="neuphonic/neucodec",
         codec_device="cpu",
+        backbone_kwargs=None,
     ):
 
         # Consts
@@ -76,14 +77,18 @@ class NeuTTSAir:
             language="en-us", preserve_punctuation=True, with_stress=True
         )
 
-        self._load_backbone(backbone_repo, backbone_device)
+        # Memoized phonemizations - the reference text is identical on every
+        # infer call, so its espeak pass only needs to run once per session
+        self._phone_cache = {}
+
+        self._load_backbone(backbone_repo, backbone_device, backbone_kwargs)
 
         self._load_codec(codec_repo, codec_device)
 
         # Load watermarker
         self.watermarker = perth.PerthImplicitWatermarker()
 
-    def _load_backbone(self, backbone_repo, backbone_device):
+    def _load_backbone(self, backbone_repo, backbone_device, backbone_kwargs=None):
         print(f"Loading backbone from: {backbone_repo} on {backbone_device} ...")
 
         # GGUF loading
@@ -98,15 +103,23 @@ class NeuTTSAir:
                     "    pip install llama-cpp-python"
                 ) from e
 
-            self.backbone = Llama.from_pretrained(
-                repo_id=backbone_repo,
-                filename="*.gguf",
-                verbose=False,
+            # Performance knobs (n_threads, n_gpu_layers, n_batch, ...) can be
+            # overridden by the caller via backbone_kwargs
+            llama_kwargs = dict(
                 n_gpu_layers=-1 if backbone_device == "gpu" else 0,
                 n_ctx=self.max_context,
                 mlock=True,
                 flash_attn=True if backbone_device == "gpu" else False,
             )
+            if backbone_kwargs:
+                llama_kwargs.update(backbone_kwargs)
+
+            self.backbone = Llama.from_pretrained(
+                repo_id=backbone_repo,
+                filename="*.gguf",
+                verbose=False,
+                **llama_kwargs,
+            )
             self._is_quantized_model = True
 
         else:
@@ -148,7 +161,13 @@ class NeuTTSAir:
                     " 'neuphonic/neucodec-onnx-decoder'."
                 )
 
-    def infer(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> np.ndarray:
+    def infer(
+        self,
+        text: str,
+        ref_codes: np.ndarray | torch.Tensor,
+        ref_text: str,
+        return_peak: bool = False,
+    ) -> np.ndarray | tuple[np.ndarray, float]:
         """
         Perform inference to generate speech from text using the TTS model and reference audio.
 
@@ -156,8 +175,13 @@ class NeuTTSAir:
             text (str): Input text to be converted to speech.
             ref_codes (np.ndarray | torch.tensor): Encoded reference.
             ref_text (str): Reference text for reference audio. Defaults to None.
+            return_peak (bool): Also return the waveform's absolute peak,
+                measured here while the buffer is still cache-hot, so callers
+                can normalize with a single scalar multiply instead of their
+                own abs+max sweep. Defaults to False.
         Returns:
-            np.ndarray: Generated speech waveform.
+            np.ndarray: Generated speech waveform, or a (waveform, peak)
+            tuple when return_peak is set.
         """
 
         # Generate tokens
@@ -171,6 +195,8 @@ class NeuTTSAir:
         wav = self._decode(output_str)
         watermarked_wav = self.watermarker.apply_watermark(wav, sample_rate=24_000)
 
+        if return_peak:
+            return watermarked_wav, float(np.max(np.abs(watermarked_wav)))
         return watermarked_wav
     
     def infer_stream(self, text: str, ref_codes: np.ndarray | torch.Tensor, ref_text: str) -> Generator[np.ndarray, None, None]:
@@ -228,11 +254,18 @@ class NeuTTSAir:
         phones = " ".join(phones)
         return phones
 
+    def _to_phones_cached(self, text: str) -> str:
+        phones = self._phone_cache.get(text)
+        if phones is None:
+            phones = self._to_phones(text)
+            self._phone_cache[text] = phones
+        return phones
+
     def _apply_chat_template(
         self, ref_codes: list[int], ref_text: str, input_text: str
     ) -> list[int]:
 
-        input_text = self._to_phones(ref_text) + " " + self._to_phones(input_text)
+        input_text = self._to_phones_cached(ref_text) + " " + self._to_phones(input_text)
         speech_replace = self.tokenizer.convert_tokens_to_ids("<|SPEECH_REPLACE|>")
         speech_gen_start = self.tokenizer.convert_tokens_to_ids("<|SPEECH_GENERATION_START|>")
         text_replace = self.tokenizer.convert_tokens_to_ids("<|TEXT_REPLACE|>")
@@ -280,7 +313,7 @@ class NeuTTSAir:
         return output_str
     
     def _infer_ggml(self, ref_codes: list[int], ref_text: str, input_text: str) -> str:
-        ref_text = self._to_phones(ref_text)
+        ref_text = self._to_phones_cached(ref_text)
         input_text = self._to_phones(input_text)
 
         codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])
@@ -299,7 +332,7 @@ class NeuTTSAir:
         return output_str
 
     def _infer_stream_ggml(self, ref_codes: torch.Tensor, ref_text: str, input_text: str) -> Generator[np.ndarray, None, None]:
-        ref_text = self._to_phones(ref_text)
+        ref_text = self._to_phones_cached(ref_text)
         input_text = self._to_phones(input_text)
 
         codes_str = "".join([f"<|speech_{idx}|>" for idx in ref_codes])